@@ -1,9 +1,11 @@
 import argparse
+from fractions import Fraction
 from z3 import And, If, Implies, Or
 
+from cache import run_query
 from config import ModelConfig
-from model import Variables, make_solver, min_send_quantum
-from pyz3_utils import run_query
+from model import Variables, min_send_quantum
+from template import make_solver_cached
 
 
 def prove_loss_bounds(timeout: float):
@@ -31,13 +33,13 @@ def prove_loss_bounds(timeout: float):
 
     # If cwnd > max_cwnd and undetected <= max_undet, cwnd will decrease
     c.T = 10
-    s, v = make_solver(c)
+    s, v = make_solver_cached(c)
     # Lemma's assumption
     s.add(v.c_f[0][0] > max_cwnd(v))
     s.add(v.L_f[0][0] - v.Ld_f[0][0] <= max_undet(v))
     # We need to assume alpha is small, since otherwise we get uninteresting
     # counter-examples. This assumption is added to the whole theorem.
-    s.add(v.alpha < (1 / 4) * c.C * c.R)
+    s.add(v.alpha < Fraction(1, 4) * c.C * c.R)
     # Lemma's statement's converse
     s.add(v.c_f[0][-1] >= v.c_f[0][0] - v.alpha)
     print("Proving that if cwnd is too big and undetected is small enough, "
@@ -53,14 +55,14 @@ def prove_loss_bounds(timeout: float):
     # Note: this lemma by itself proves that undetected will eventually fall
     # below max_undet. Then, coupled with the above lemma, we have that AIMD
     # will always enter steady state
-    s, v = make_solver(c)
+    s, v = make_solver_cached(c)
     # Lemma's assumption
     min_send_quantum(c, s, v)
     s.add(v.L_f[0][0] - v.Ld_f[0][0] > max_undet(v))
     s.add(Or(
         v.L_f[0][-1] - v.Ld_f[0][-1] > v.L_f[0][0] - v.Ld_f[0][0] - c.C,
         v.c_f[0][-1] > max_cwnd(v)))
-    s.add(v.alpha < 1 / 5)
+    s.add(v.alpha < Fraction(1, 5))
     # Lemma's statement's converse
     s.add(Or(v.c_f[0][0] <= max_cwnd(v),
              v.c_f[0][-1] >= v.c_f[0][0] - v.alpha))
@@ -72,11 +74,11 @@ def prove_loss_bounds(timeout: float):
     # If we are in steady state, we'll remain there. In steady state: cwnd <=
     # max_cwnd, undetected <= max_undet
     c.T = 10
-    s, v = make_solver(c)
+    s, v = make_solver_cached(c)
     # Lemma's assumption
     s.add(v.L_f[0][0] - v.Ld_f[0][0] <= max_undet(v))
     s.add(v.c_f[0][0] <= max_cwnd(v))
-    s.add(v.alpha < 1 / 3)
+    s.add(v.alpha < Fraction(1, 3))
     # Lemma's statement's converse
     s.add(Or(
         v.L_f[0][-1] - v.Ld_f[0][-1] > max_undet(v),
@@ -91,11 +93,11 @@ def prove_loss_bounds(timeout: float):
     print("Proving threshold on when loss can happen")
     for beta in [0.5, 1.9, 3]:
         c.buf_min = beta
-        s, v = make_solver(c)
+        s, v = make_solver_cached(c)
         # Lemma's assumption
         s.add(v.L_f[0][0] - v.Ld_f[0][0] <= max_undet(v))
         s.add(v.c_f[0][0] <= max_cwnd(v))
-        s.add(v.alpha < 1 / 3)
+        s.add(v.alpha < Fraction(1, 3))
 
         if beta <= c.C * (c.R + c.D):
             cwnd_thresh = c.buf_min - v.alpha
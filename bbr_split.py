@@ -0,0 +1,87 @@
+''' Solve BBR queries by case-splitting over the start phase of every flow.
+With the phases fixed, cca_bbr needs no Ints, so each sub-query is pure LRA
+and the sub-queries can be solved in parallel '''
+
+import copy
+from itertools import combinations_with_replacement, product
+import multiprocessing as mp
+from typing import List, Optional, Tuple
+
+from bound_search import QueryBuilder
+from cca_bbr import bbr_params
+from config import ModelConfig
+from pyz3_utils import QueryResult, run_query
+
+
+class PhaseSplitResult:
+    # "sat", "unsat" or "unknown"
+    satisfiable: str
+    # The phases of the satisfying sub-query (if sat)
+    phases: Optional[Tuple[int, ...]]
+    # The result of the satisfying sub-query (if sat)
+    qres: Optional[QueryResult]
+    # The config of the satisfying sub-query (if sat). Use this rather than
+    # the original config to plot qres.model
+    cfg: Optional[ModelConfig]
+    # Result of every sub-query that finished
+    results: List[Tuple[Tuple[int, ...], str]]
+
+    def __init__(self):
+        self.satisfiable = "unsat"
+        self.phases = None
+        self.qres = None
+        self.cfg = None
+        self.results = []
+
+
+def phase_assignments(c: ModelConfig,
+                      symmetric: bool = False) -> List[Tuple[int, ...]]:
+    ''' All assignments of start phases to the flows. If `symmetric`, only one
+    assignment per multiset of phases. That is only sound if the query treats
+    all flows alike (see symmetry.flows_interchangeable) '''
+    _, cycle = bbr_params(c)
+    if symmetric:
+        return list(combinations_with_replacement(range(cycle), c.N))
+    return list(product(range(cycle), repeat=c.N))
+
+
+def phase_config(c: ModelConfig, phases: Tuple[int, ...]) -> ModelConfig:
+    ''' Copy of `c` with the start phases fixed to `phases` '''
+    c = copy.copy(c)
+    c.bbr_start_phases = list(phases)
+    return c
+
+
+def _solve_phase(args: Tuple[ModelConfig, QueryBuilder, Tuple[int, ...],
+                             float]) -> Tuple[Tuple[int, ...], QueryResult]:
+    c, build, phases, timeout = args
+    c = phase_config(c, phases)
+    s, v = build(c)
+    return (phases, run_query(c, s, v, timeout))
+
+
+def run_phase_split(c: ModelConfig, build: QueryBuilder, timeout: float = 10,
+                    processes: Optional[int] = None,
+                    symmetric: bool = False) -> PhaseSplitResult:
+    ''' Solve the query `build(c)` once per assignment of BBR start phases,
+    using a pool of `processes` workers (default: one per core). Returns as
+    soon as some sub-query is sat. Otherwise the result is unsat if every
+    sub-query is unsat and unknown if any of them is unknown '''
+    assert c.cca == "bbr"
+    res = PhaseSplitResult()
+    tasks = [(c, build, phases, timeout)
+             for phases in phase_assignments(c, symmetric)]
+    with mp.Pool(processes) as pool:
+        for phases, qres in pool.imap_unordered(_solve_phase, tasks):
+            sat = str(qres.satisfiable)
+            res.results.append((phases, sat))
+            if sat == "sat":
+                res.satisfiable = "sat"
+                res.phases = phases
+                res.qres = qres
+                res.cfg = phase_config(c, phases)
+                # Leaving the with block terminates the remaining workers
+                break
+            if sat != "unsat":
+                res.satisfiable = "unknown"
+    return res
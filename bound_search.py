@@ -0,0 +1,165 @@
+''' Parallel search for the threshold at which a query flips between sat and
+unsat, e.g. the lowest utilization a CCA can get. Every round probes k
+thresholds at once in a process pool and shrinks the interval (k+1)-fold '''
+
+import multiprocessing as mp
+import os
+import time
+from fractions import Fraction
+from typing import Callable, List, Optional, Tuple, Union
+import z3
+from z3.z3util import get_vars
+
+import cache
+from config import ModelConfig, exact
+from pyz3_utils import ModelDict, MySolver, QueryResult, run_query
+from variables import Variables
+
+# Builds the solver for a query. Builders are sent to worker processes, so
+# they must be picklable (i.e. module-level functions)
+QueryBuilder = Callable[[ModelConfig], Tuple[MySolver, Variables]]
+# Like QueryBuilder, but builds the query for a threshold
+ModelCons = Callable[[ModelConfig, Fraction], Tuple[MySolver, Variables]]
+# The quantity the threshold bounds, in the same units as the threshold (e.g.
+# utilization). Also sent to the workers, so it must be picklable too
+Metric = Callable[[ModelConfig, Variables], z3.ArithRef]
+
+
+def eval_metric(e: z3.ArithRef, model: ModelDict) -> Optional[Fraction]:
+    ''' Value of `e` in `model`, or None if the model does not determine it '''
+    subs = []
+    for x in get_vars(e):
+        if str(x) not in model:
+            return None
+        val = model[str(x)]
+        if z3.is_bool(x):
+            subs.append((x, z3.BoolVal(val)))
+        elif z3.is_int(x):
+            subs.append((x, z3.IntVal(val)))
+        else:
+            subs.append((x, z3.RealVal(val)))
+    val = z3.simplify(z3.substitute(e, *subs) if len(subs) > 0 else e)
+    if not z3.is_rational_value(val):
+        return None
+    return val.as_fraction()
+
+
+class Probe:
+    # The threshold tested
+    thresh: Fraction
+    # "sat", "unsat" or "unknown"
+    satisfiable: str
+    # Wall-clock time to build and solve the query (in seconds)
+    time: float
+    # The round of the search in which this was probed
+    round: int
+    # The result of the query
+    qres: Optional[QueryResult]
+    # Value of the search's metric in the model (if sat and a metric was
+    # given)
+    metric: Optional[Fraction]
+
+    def __init__(self, thresh: Fraction, satisfiable: str, time: float,
+                 round: int, qres: Optional[QueryResult]):
+        self.thresh = thresh
+        self.satisfiable = satisfiable
+        self.time = time
+        self.round = round
+        self.qres = qres
+        self.metric = None
+
+
+class BoundSearchResult:
+    # The threshold flips between lo and hi. The unsat side is lo if
+    # sat_above and hi otherwise. If a side was never observed, it is the
+    # initial bound
+    lo: Fraction
+    hi: Fraction
+    # Every probe, in the order they finished
+    probes: List[Probe]
+    # Whether some results contradicted monotonicity in the threshold
+    inconsistent: bool
+
+    def __init__(self, lo: Fraction, hi: Fraction):
+        self.lo, self.hi = lo, hi
+        self.probes = []
+        self.inconsistent = False
+
+    def __str__(self):
+        return (f"threshold in [{self.lo}, {self.hi}] after "
+                f"{len(self.probes)} probes"
+                + (" (inconsistent results)" if self.inconsistent else ""))
+
+
+def _probe(args: Tuple[ModelCons, ModelConfig, Fraction, float, Optional[str],
+                       int, Optional[Metric]]) -> Probe:
+    model_cons, cfg, thresh, timeout, cache_dir, round, metric = args
+    start = time.time()
+    s, v = model_cons(cfg, thresh)
+    if cache_dir is None:
+        qres = run_query(cfg, s, v, timeout)
+    else:
+        qres = cache.run_query(cfg, s, v, timeout, cache_dir=cache_dir)
+    sat = str(qres.satisfiable)
+    if sat not in ["sat", "unsat"]:
+        sat = "unknown"
+    res = Probe(thresh, sat, time.time() - start, round, qres)
+    if sat == "sat" and metric is not None and qres.model is not None:
+        res.metric = eval_metric(metric(cfg, v), qres.model)
+    return res
+
+
+def find_bound(model_cons: ModelCons, cfg: ModelConfig,
+               lo: Union[float, Fraction], hi: Union[float, Fraction],
+               err: Union[float, Fraction], timeout: float = 10,
+               sat_above: bool = True,
+               k: Optional[int] = None, processes: Optional[int] = None,
+               max_rounds: int = 100,
+               cache_dir: Optional[str] = cache.CACHE_DIR,
+               metric: Optional[Metric] = None) -> BoundSearchResult:
+    ''' Find the threshold in [lo, hi] where `model_cons(cfg, thresh)` flips
+    from unsat to sat (or from sat to unsat if not `sat_above`) to within
+    `err`. The query must be monotone in the threshold. Probes `k` thresholds
+    per round (default: one per process) using `processes` workers (default:
+    one per core). Probes that time out do not narrow the interval. The search
+    stops when a round makes no progress. Set `cache_dir` to None to bypass
+    the query cache. `lo`, `hi` and `err` are converted to exact Fractions
+    (see config.exact), so every probed threshold is a Fraction too.
+
+    If `metric` is given, it is evaluated on every sat model. A witness with
+    metric value m shows the query is sat for every threshold beyond m, so the
+    bound jumps to m rather than to the probed threshold '''
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if k is None:
+        k = processes
+    lo, hi, err = exact(lo), exact(hi), exact(err)
+    assert k >= 1 and lo < hi
+    res = BoundSearchResult(lo, hi)
+
+    with mp.Pool(processes) as pool:
+        for round in range(max_rounds):
+            if res.hi - res.lo <= err:
+                break
+            step = (res.hi - res.lo) / (k + 1)
+            tasks = [(model_cons, cfg, res.lo + i * step, timeout, cache_dir,
+                      round, metric) for i in range(1, k + 1)]
+            probes = list(pool.imap_unordered(_probe, tasks))
+            res.probes.extend(probes)
+
+            sats = [p.thresh if p.metric is None else p.metric
+                    for p in probes if p.satisfiable == "sat"]
+            unsats = [p.thresh for p in probes if p.satisfiable == "unsat"]
+            old = (res.lo, res.hi)
+            if sat_above:
+                res.hi = min([res.hi] + sats)
+                res.lo = max([res.lo] + [x for x in unsats if x < res.hi])
+                res.inconsistent |= any(x >= res.hi for x in unsats)
+            else:
+                res.lo = max([res.lo] + sats)
+                res.hi = min([res.hi] + [x for x in unsats if x > res.lo])
+                res.inconsistent |= any(x <= res.lo for x in unsats)
+            if (res.lo, res.hi) == old:
+                # Every probe timed out
+                break
+    return res
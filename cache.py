@@ -0,0 +1,95 @@
+''' On-disk cache of query results. Queries are keyed by a hash of the
+asserted formula and the solver settings, so re-running a script (e.g.
+aimd_proofs.py) after an unrelated edit only solves the queries that actually
+changed. Each entry is a pickled QueryResult in `cached/<key>.cached`, which
+`python3 plot.py cached/<key>.cached` can plot '''
+
+import hashlib
+import os
+import pickle as pkl
+import tempfile
+import time
+from typing import Dict, Optional
+
+from config import ModelConfig
+from pyz3_utils import MySolver, QueryResult, run_query as run_query_uncached
+from variables import Variables
+
+CACHE_DIR = "cached"
+
+
+def query_key(c: ModelConfig, s: MySolver) -> str:
+    ''' Hash of the formula asserted in `s` and the settings that affect how it
+    is solved. Assertions are sorted, so the order in which they were added
+    does not matter. The timeout is not part of the key (see `run_query`) '''
+    h = hashlib.sha256()
+    for e in sorted(x.sexpr() for x in s.s.assertions()):
+        h.update(e.encode())
+        h.update(b"\n")
+    solver = [getattr(s, "logic", None), getattr(s, "tactics", None),
+              c.unsat_core]
+    h.update(repr(solver).encode())
+    return h.hexdigest()[:16]
+
+
+def _path(key: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, key + ".cached")
+
+
+def lookup(key: str, timeout: float,
+           cache_dir: str = CACHE_DIR) -> Optional[QueryResult]:
+    ''' The cached result, if it is still valid for `timeout`. sat/unsat
+    verdicts hold for any timeout. An unknown verdict is only reused if it was
+    obtained with at least this timeout '''
+    try:
+        with open(_path(key, cache_dir), "rb") as f:
+            qres: QueryResult = pkl.load(f)
+    except (OSError, EOFError, pkl.UnpicklingError):
+        return None
+    if str(qres.satisfiable) in ["sat", "unsat"]:
+        return qres
+    if getattr(qres, "timeout", 0) >= timeout:
+        return qres
+    return None
+
+
+def store(key: str, qres: QueryResult, cache_dir: str = CACHE_DIR):
+    ''' Atomically write an entry, so concurrent processes never see a partial
+    file. If two processes solve the same query, the last write wins '''
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pkl.dump(qres, f)
+        os.replace(tmp, _path(key, cache_dir))
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _statistics(s: MySolver) -> Dict[str, float]:
+    st = s.s.statistics()
+    return {k: st.get_key_value(k) for k in st.keys()}
+
+
+def run_query(c: ModelConfig, s: MySolver, v: Variables, timeout: float = 10,
+              cache_dir: str = CACHE_DIR) -> QueryResult:
+    ''' Same as pyz3_utils.run_query, but answers from the cache when
+    possible. The result additionally records `cfg`, `timeout`, `solve_time`,
+    `statistics` (z3's solver statistics) and `cached` (whether it came from
+    the cache) '''
+    key = query_key(c, s)
+    qres = lookup(key, timeout, cache_dir)
+    if qres is not None:
+        qres.cached = True
+        return qres
+
+    start = time.time()
+    qres = run_query_uncached(c, s, v, timeout)
+    qres.solve_time = time.time() - start
+    qres.cfg = c
+    qres.timeout = timeout
+    qres.statistics = _statistics(s)
+    qres.cached = False
+    store(key, qres, cache_dir)
+    return qres
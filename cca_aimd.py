@@ -1,4 +1,4 @@
-from z3 import And, Implies, Not, Or
+from z3 import And, If, Implies, Not, Or
 
 from config import ModelConfig
 from pyz3_utils import MySolver
@@ -10,6 +10,13 @@ class AIMDVariables:
         # Whether or not cwnd can increase at this point
         self.incr_f = [[s.Bool(f"aimd_incr_{n},{t}") for t in range(c.T)]
                        for n in range(c.N)]
+        if c.aimd_incr_chained and not c.aimd_incr_irrespective:
+            # same_f[n][t][dt] is true iff c_f[n][t-ddt] == c_f[n][t] for all
+            # 1 <= ddt <= dt
+            self.same_f = [[[s.Bool(f"aimd_same_{n},{t},{dt}")
+                             for dt in range(t+1)]
+                            for t in range(c.T)]
+                           for n in range(c.N)]
 
 
 def can_incr(
@@ -24,6 +31,22 @@ def can_incr(
                 s.add(cv.incr_f[n][t])
         return
 
+    def unchanged(n: int, t: int, dt: int):
+        ''' cwnd at t-dt, ..., t-1 is the same as at t '''
+        if c.aimd_incr_chained:
+            return cv.same_f[n][t][dt]
+        return And([v.c_f[n][t-ddt] == v.c_f[n][t]
+                    for ddt in range(1, dt+1)])
+
+    if c.aimd_incr_chained:
+        for n in range(c.N):
+            for t in range(c.T):
+                s.add(cv.same_f[n][t][0])
+                for dt in range(1, t+1):
+                    s.add(cv.same_f[n][t][dt] == And(
+                        cv.same_f[n][t][dt-1],
+                        v.c_f[n][t-dt] == v.c_f[n][t]))
+
     for n in range(c.N):
         for t in range(1, c.T):
             # Increase cwnd only if we have got enough acks
@@ -43,13 +66,11 @@ def can_incr(
 
 
                 incr.append(And(
-                    And([v.c_f[n][t-ddt] == v.c_f[n][t]
-                         for ddt in range(1, dt+1)]),
+                    unchanged(n, t, dt),
                     v.c_f[n][t-dt-1] != v.c_f[n][t-dt],
                     v.S_f[n][t] - v.S_f[n][t-dt] >= v.c_f[n][t]))
             incr.append(And(
-                And([v.c_f[n][t-ddt] == v.c_f[n][t]
-                     for ddt in range(1, t+1)]),
+                unchanged(n, t, t),
                 v.S_f[n][t] - v.S_f[n][0] >= v.c_f[n][t]))
             incr.append(And(
                 v.S_f[n][t] - v.S_f[n][t-1] >= v.c_f[n][t]))
@@ -60,13 +81,14 @@ def cca_aimd(c: ModelConfig, s: MySolver, v: Variables) -> AIMDVariables:
     cv = AIMDVariables(c, s)
     can_incr(c, s, v, cv)
 
-    # The last send sequence number at which loss was detected
-    ll = [[s.Real(f"last_loss_{n},{t}") for t in range(c.T)]
-          for n in range(c.N)]
     s.add(v.dupacks == 3 * v.alpha)
     for n in range(c.N):
+        # The last send sequence number at which loss was detected. It only
+        # changes at decrease/timeout events, so rather than a Real per
+        # timestep tied to its predecessor by an equality, ll[t] is the term
+        # If(event at t, new value, ll[t-1]). Only ll[:T-1] is ever read
         # TODO: make this non-deterministic?
-        s.add(ll[n][0] == v.S_f[n][0])
+        ll = [v.S_f[n][0]]
         for t in range(c.T):
             if c.pacing:
                 s.add(v.r_f[n][t] == v.c_f[n][t] / c.R)
@@ -80,19 +102,21 @@ def cca_aimd(c: ModelConfig, s: MySolver, v: Variables) -> AIMDVariables:
                 if t > c.R+1:
                     decrease = And(
                         v.Ld_f[n][t] > v.Ld_f[n][t-1],
-                        ll[n][t-1] <= v.S_f[n][t-c.R-1]
+                        ll[t-1] <= v.S_f[n][t-c.R-1]
                     )
                 else:
                     decrease = v.Ld_f[n][t] > v.Ld_f[n][t-1]
 
+                if t < c.T - 1:
+                    # Both a decrease and a timeout set last_loss to the same
+                    # value
+                    ll.append(If(Or(decrease, v.timeout_f[n][t]),
+                                 v.A_f[n][t] - v.L_f[n][t] + v.dupacks,
+                                 ll[t-1]))
+
                 s.add(Implies(
                     And(decrease, Not(v.timeout_f[n][t])),
-                    And(ll[n][t] == v.A_f[n][t] - v.L_f[n][t] + v.dupacks,
-                        v.c_f[n][t] == v.c_f[n][t-1] / 2)
-                ))
-                s.add(Implies(
-                    And(Not(decrease), Not(v.timeout_f[n][t])),
-                    ll[n][t] == ll[n][t-1]))
+                    v.c_f[n][t] == v.c_f[n][t-1] / 2))
 
                 s.add(Implies(
                     And(Not(decrease), Not(v.timeout_f[n][t]),
@@ -104,8 +128,5 @@ def cca_aimd(c: ModelConfig, s: MySolver, v: Variables) -> AIMDVariables:
                     v.c_f[n][t] == v.c_f[n][t-1]))
 
                 # Timeout
-                s.add(Implies(v.timeout_f[n][t],
-                              And(v.c_f[n][t] == v.alpha,
-                                  ll[n][t] == v.A_f[n][t] - v.L_f[n][t]
-                                  + v.dupacks)))
+                s.add(Implies(v.timeout_f[n][t], v.c_f[n][t] == v.alpha))
     return cv
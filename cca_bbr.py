@@ -1,5 +1,7 @@
 ''' A simplified version of BBR '''
 
+from fractions import Fraction
+from typing import Any, Dict, Tuple
 from z3 import And, If, Implies, Not
 
 from config import ModelConfig
@@ -14,46 +16,96 @@ class BBRSimpleVariables:
             [s.Int(f"bbr_start_state_{n}") for n in range(c.N)]
 
 
+def sliding_max_rate(c: ModelConfig, s: MySolver, v: Variables, n: int,
+                     P: int, max_R: int) -> Dict[int, Any]:
+    ''' For every t >= R + P, the max of the rates (measured over P) of flow n
+    over the last max_R RTTs. We use the van Herk/Gil-Werman decomposition: the
+    rate timesteps are split into blocks of max_R and we keep running maxima
+    from the start (pmax) and from the end (smax) of each block. Every window
+    is then either a block prefix or a suffix of one block followed by a prefix
+    of the next, so it needs at most one If. This is O(T) Ifs instead of
+    O(T max_R) for a separate chain per timestep '''
+    # rate[u] is the rate measured at u, i.e. over (u-P, u]
+    rate = {u: (v.S_f[n][u] - v.S_f[n][u-P]) / P
+            for u in range(P, c.T - c.R)}
+
+    def block(u: int) -> int:
+        return (u - P) // max_R
+
+    pmax = {u: s.Real(f"bbr_pmax_{n},{u}") for u in rate}
+    smax = {u: s.Real(f"bbr_smax_{n},{u}") for u in rate}
+    for u in rate:
+        if u == P or block(u) != block(u-1):
+            s.add(pmax[u] == rate[u])
+        else:
+            s.add(pmax[u] == If(rate[u] > pmax[u-1], rate[u], pmax[u-1]))
+    for u in reversed(list(rate)):
+        if u + 1 not in rate or block(u) != block(u+1):
+            s.add(smax[u] == rate[u])
+        else:
+            s.add(smax[u] == If(rate[u] > smax[u+1], rate[u], smax[u+1]))
+
+    res = {}
+    for t in range(c.R + P, c.T):
+        # The window is [lo, hi]
+        hi = t - c.R
+        lo = max(P, hi - max_R + 1)
+        res[t] = s.Real(f"max_rate_{n},{t}")
+        if lo == P + block(lo) * max_R:
+            s.add(res[t] == pmax[hi])
+        else:
+            s.add(res[t] == If(smax[lo] > pmax[hi], smax[lo], pmax[hi]))
+    return res
+
+
+def bbr_params(c: ModelConfig) -> Tuple[int, int]:
+    ''' Returns (max_R, cycle) '''
+    if c.enhancement:
+        # Number of RTTs over which we compute the max_cwnd (=10 in the spec)
+        # and the number of RTTs in the BBR cycle (=8 in the spec)
+        return (10, 8)
+    return (4, 4)
+
+
 def cca_bbr(c: ModelConfig, s: MySolver, v: Variables):
     # The period over which we compute rates
     P = c.R
-    if c.enhancement:
-        # Number of RTTs over which we compute the max_cwnd (=10 in the spec)
-        max_R = 10
-        # The number of RTTs in the BBR cycle (=8 in the spec)
-        cycle = 8
+    max_R, cycle = bbr_params(c)
+    if c.bbr_start_phases is None:
+        # The state the flow starts in at t=0
+        start_state_f = [s.Int(f"bbr_start_state_{n}") for n in range(c.N)]
     else:
-        max_R = 4
-        cycle = 4
-    # The state the flow starts in at t=0
-    start_state_f = [s.Int(f"bbr_start_state_{n}") for n in range(c.N)]
+        # Fixed by the caller (e.g. when case-splitting over phases). The
+        # phase conditions below are then plain Python bools
+        assert len(c.bbr_start_phases) == c.N
+        start_state_f = list(c.bbr_start_phases)
 
     for n in range(c.N):
-        s.add(start_state_f[n] >= 0)
-        s.add(start_state_f[n] < cycle)
+        if c.bbr_start_phases is None:
+            s.add(start_state_f[n] >= 0)
+            s.add(start_state_f[n] < cycle)
+        else:
+            assert 0 <= start_state_f[n] < cycle
+        max_rate = sliding_max_rate(c, s, v, n, P, max_R)
         for t in range(c.R + P, c.T):
-            # Compute the max RTT over the last max_R RTTs
-            max_rate = [s.Real(f"max_rate_{n},{t},{dt}")
-                        for dt in range(min(t-c.R-P+1, max_R))]
-            s.add(max_rate[0] == (v.S_f[n][t-c.R] - v.S_f[n][t-c.R-P]) / P)
-            for dt in range(1, len(max_rate)):
-                rate = (v.S_f[n][t-dt-c.R] - v.S_f[n][t-dt-c.R-P]) / P
-                s.add(max_rate[dt] == If(rate > max_rate[dt-1],
-                                         rate, max_rate[dt-1]))
-
-            # Convenience variable for plotting
-            s.add(s.Real(f"max_rate_{n},{t}") == max_rate[-1])
-
-            s.add(v.c_f[n][t] == 2 * max_rate[-1] * P)
+            s.add(v.c_f[n][t] == 2 * max_rate[t] * P)
             s_0 = (start_state_f[n] == (0 - t / c.R) % cycle)
             s_1 = (start_state_f[n] == (1 - t / c.R) % cycle)
-            s.add(Implies(s_0,
-                          v.r_f[n][t] == 1.25 * max_rate[-1]))
             if c.enhancement:
-                s.add(Implies(s_1,
-                              v.r_f[n][t] == 0.75 * max_rate[-1]))
+                s_1_gain = Fraction(3, 4)
             else:
-                s.add(Implies(s_1,
-                              v.r_f[n][t] == 0.8 * max_rate[-1]))
+                s_1_gain = Fraction(4, 5)
+            if c.bbr_start_phases is not None:
+                if s_0:
+                    s.add(v.r_f[n][t] == Fraction(5, 4) * max_rate[t])
+                elif s_1:
+                    s.add(v.r_f[n][t] == s_1_gain * max_rate[t])
+                else:
+                    s.add(v.r_f[n][t] == 1 * max_rate[t])
+                continue
+            s.add(Implies(s_0,
+                          v.r_f[n][t] == Fraction(5, 4) * max_rate[t]))
+            s.add(Implies(s_1,
+                          v.r_f[n][t] == s_1_gain * max_rate[t]))
             s.add(Implies(And(Not(s_0), Not(s_1)),
-                          v.r_f[n][t] == 1 * max_rate[-1]))
+                          v.r_f[n][t] == 1 * max_rate[t]))
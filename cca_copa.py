@@ -1,3 +1,5 @@
+from fractions import Fraction
+from typing import Any, Dict, List
 from z3 import And, If, Implies, Not, Or
 
 from config import ModelConfig
@@ -5,7 +7,48 @@ from pyz3_utils import MySolver
 from variables import Variables
 
 
+class CopaObservations:
+    ''' Copa's delay measurements can be delayed by the jitter D, so a
+    decision at t may act on the queueing delay of any timestep in a window of
+    D timesteps. For a window ending at e, qdel[e][dt] says whether some
+    timestep in [e-D+1, e] had a queueing delay of dt (and over[e] the same for
+    qdel_over). These are shared between flows and timesteps, so the
+    per-decision encoding stays linear in T. For D == 1 they are just qdel '''
+
+    def __init__(self, c: ModelConfig, s: MySolver, v: Variables):
+        self.c, self.s, self.v = c, s, v
+        self.qdel: Dict[int, List[Any]] = {}
+        self.over: Dict[int, Any] = {}
+
+    def window(self, e: int) -> List[int]:
+        return list(range(max(0, e - self.c.D + 1), e + 1))
+
+    def get_qdel(self, e: int) -> List[Any]:
+        c, s, v = self.c, self.s, self.v
+        if c.D == 1:
+            return v.qdel[e]
+        if e not in self.qdel:
+            Q = c.qdel_window_len()
+            self.qdel[e] = []
+            for dt in range(Q):
+                x = s.Bool(f"copa_qdel_seen_{e},{dt}")
+                s.add(x == Or(*[v.qdel[u][dt] for u in self.window(e)]))
+                self.qdel[e].append(x)
+        return self.qdel[e]
+
+    def get_over(self, e: int) -> Any:
+        c, s, v = self.c, self.s, self.v
+        if c.D == 1:
+            return v.qdel_over[e]
+        if e not in self.over:
+            x = s.Bool(f"copa_qdel_over_seen_{e}")
+            s.add(x == Or(*[v.qdel_over[u] for u in self.window(e)]))
+            self.over[e] = x
+        return self.over[e]
+
+
 def cca_copa(c: ModelConfig, s: MySolver, v: Variables):
+    obs = CopaObservations(c, s, v)
     for n in range(c.N):
         for t in range(c.T):
             # Basic constraints
@@ -15,27 +58,53 @@ def cca_copa(c: ModelConfig, s: MySolver, v: Variables):
             if t - c.R - c.D < 0:
                 continue
 
+            # Increase decisions see the delays in [t-R-D+1, t-R] and decrease
+            # decisions those in [t-R-D, t-R-1]. qdel[t] has at most one true
+            # entry, so the conditions below are a plain disjunction over the
+            # delay. With c.copa_debug, each term gets a named Bool so
+            # plot_model can print them per dt
+            incr_qdel = obs.get_qdel(t-c.R)
+            decr_qdel = obs.get_qdel(t-c.R-1)
             incr_alloweds, decr_alloweds = [], []
-            for dt in range(t+1):
+            Q = c.qdel_window_len()
+            for dt in range(min(t+1, Q)):
                 # Whether we are allowd to increase/decrease
-                incr_allowed = s.Bool("incr_allowed_%d,%d,%d" % (n, t, dt))
-                decr_allowed = s.Bool("decr_allowed_%d,%d,%d" % (n, t, dt))
-                # Warning: Adversary here is too powerful if D > 1. Add
-                # a constraint for every point between t-1 and t-1-D
-                assert(c.D == 1)
-                s.add(incr_allowed
-                      == And(
-                          v.qdel[t-c.R][dt],
-                          v.S[t-c.R] > v.S[t-c.R-1],
-                          v.c_f[n][t-1] * max(0, dt-1)
-                          <= v.alpha*(c.R+max(0, dt-1))))
-                s.add(decr_allowed
-                      == And(
-                          v.qdel[t-c.R-c.D][dt],
-                          v.S[t-c.R] > v.S[t-c.R-1],
-                          v.c_f[n][t-1] * dt >= v.alpha * (c.R + dt)))
-                incr_alloweds.append(incr_allowed)
-                decr_alloweds.append(decr_allowed)
+                incr_cond = And(
+                    incr_qdel[dt],
+                    v.c_f[n][t-1] * max(0, dt-1)
+                    <= v.alpha*(c.R+max(0, dt-1)))
+                decr_cond = And(
+                    decr_qdel[dt],
+                    v.c_f[n][t-1] * dt >= v.alpha * (c.R + dt))
+                if c.copa_debug:
+                    incr_allowed = s.Bool("incr_allowed_%d,%d,%d" % (n, t, dt))
+                    decr_allowed = s.Bool("decr_allowed_%d,%d,%d" % (n, t, dt))
+                    s.add(incr_allowed
+                          == And(incr_cond, v.S[t-c.R] > v.S[t-c.R-1]))
+                    s.add(decr_allowed
+                          == And(decr_cond, v.S[t-c.R] > v.S[t-c.R-1]))
+                    incr_cond, decr_cond = incr_allowed, decr_allowed
+                incr_alloweds.append(incr_cond)
+                decr_alloweds.append(decr_cond)
+            if Q < t+1:
+                # Delays >= Q are only known through qdel_over. Use the most
+                # permissive dt in that range: the smallest for increase, the
+                # largest possible (t-R-2, at t-R-1) for decrease. This is an
+                # over-approximation, only reached when c.qdel_window < T
+                incr_alloweds.append(And(
+                    obs.get_over(t-c.R),
+                    v.c_f[n][t-1] * max(0, Q-1)
+                    <= v.alpha*(c.R+max(0, Q-1))))
+                decr_alloweds.append(And(
+                    obs.get_over(t-c.R-1),
+                    v.c_f[n][t-1] * (t-c.R-2)
+                    >= v.alpha * (t-2)))
+            # Both are only allowed if S increased (the debug Bools include
+            # this already, but repeating it is harmless)
+            incr_alloweds = [And(v.S[t-c.R] > v.S[t-c.R-1],
+                                 Or(*incr_alloweds))]
+            decr_alloweds = [And(v.S[t-c.R] > v.S[t-c.R-1],
+                                 Or(*decr_alloweds))]
             # If inp is high at the beginning, qdel can be arbitrarily
             # large
             decr_alloweds.append(v.S[t-c.R] < v.A[0] - v.L[0])
@@ -55,3 +124,28 @@ def cca_copa(c: ModelConfig, s: MySolver, v: Variables):
             sub = v.c_f[n][t-1] - v.alpha / c.R
             s.add(Implies(decr, v.c_f[n][t]
                           == If(sub < v.alpha, v.alpha, sub)))
+
+
+if __name__ == "__main__":
+    # Formula size and solve time of a Copa query as the jitter grows
+    import time
+    from instrument import InstrumentedSolver
+    from model import make_solver
+    from pyz3_utils import run_query
+
+    for D in [1, 2, 4]:
+        c = ModelConfig.default()
+        c.cca = "copa"
+        c.compose = True
+        c.D = D
+        c.T = 10 + D
+        s, v = make_solver(c, InstrumentedSolver())
+        copa = [r for r in s.report() if r["name"] in
+                ["cca_copa", "CopaObservations.get_qdel",
+                 "CopaObservations.get_over"]]
+        nodes = sum(r["ast_nodes"] for r in copa)
+        s.add(v.S[-1] - v.S[0] < Fraction(1, 10) * c.C * c.T)
+        start = time.time()
+        qres = run_query(c, s, v, timeout=120)
+        print(f"D={D} T={c.T}: {nodes} AST nodes in the Copa constraints, "
+              f"{qres.satisfiable} in {time.time() - start:.2f}s")
@@ -0,0 +1,74 @@
+''' Registry of the CCAs the model supports. Each CCA declares where its
+encoder lives along with metadata the rest of the model needs. Encoders are
+imported on first use, so e.g. a query with a constant cwnd never loads the
+Copa or BBR modules '''
+
+from importlib import import_module
+from typing import Any, Callable, Dict, List, Optional
+
+from config import ModelConfig
+from pyz3_utils import MySolver
+from variables import Variables
+
+
+def _load(path: str) -> Any:
+    ''' Load "module:attribute" '''
+    module, attr = path.split(":")
+    return getattr(import_module(module), attr)
+
+
+class CCASpec:
+    # Name used in ModelConfig.cca
+    name: str
+    # "module:function" that adds the CCA's constraints given (c, s, v). None
+    # if the CCA is left unconstrained
+    encoder: Optional[str]
+    # Number of timesteps at the start for which the CCA can pick any cwnd.
+    # This is the `dur` make_periodic needs
+    freedom_duration: Callable[[ModelConfig], int]
+    # Whether the encoder uses Variables.qdel
+    needs_qdel: bool
+
+    def __init__(self, name: str, encoder: Optional[str],
+                 freedom_duration: Callable[[ModelConfig], int],
+                 needs_qdel: bool = False):
+        self.name = name
+        self.encoder = encoder
+        self.freedom_duration = freedom_duration
+        self.needs_qdel = needs_qdel
+
+    def encode(self, c: ModelConfig, s: MySolver, v: Variables) -> Any:
+        if self.encoder is None:
+            return None
+        return _load(self.encoder)(c, s, v)
+
+
+_registry: Dict[str, CCASpec] = {}
+
+
+def register_cca(spec: CCASpec):
+    _registry[spec.name] = spec
+
+
+def get_cca(name: str) -> CCASpec:
+    if name not in _registry:
+        raise ValueError(f"Unknown CCA '{name}'. Registered CCAs: "
+                         f"{', '.join(registered_ccas())}")
+    return _registry[name]
+
+
+def registered_ccas() -> List[str]:
+    return list(_registry.keys())
+
+
+def freedom_duration(c: ModelConfig) -> int:
+    ''' The number of timesteps for which c.cca can pick any cwnd '''
+    return get_cca(c.cca).freedom_duration(c)
+
+
+register_cca(CCASpec("const", "model:cca_const", lambda c: 0))
+register_cca(CCASpec("aimd", "cca_aimd:cca_aimd", lambda c: 1))
+register_cca(CCASpec("copa", "cca_copa:cca_copa", lambda c: c.R + c.D,
+                     needs_qdel=True))
+register_cca(CCASpec("bbr", "cca_bbr:cca_bbr", lambda c: 2 * c.R))
+register_cca(CCASpec("any", None, lambda c: 0))
@@ -415,14 +415,23 @@ def simplify_solution(c: ModelConfig,
                         - values[vars[f"cwnd_{n},{t-1}"]]) ** 2 / (c.T * c.N)
         return res
 
+    def agg(name: str, flow_name: str, t: int) -> str:
+        ''' Name of an aggregate variable. These are aliases for flow 0's
+        variables if the config says so '''
+        if c.aggregates_aliased():
+            return f"{flow_name}_0,{t}"
+        return f"{name}_{t}"
+
     # Score for the new implementation
     def score2(values: np.ndarray) -> float:
         res = 0
         for t in range(1, c.T):
-            res += (values[vars[f"tot_arrival_{t}"]]
-                    - values[vars[f"tot_arrival_{t-1}"]]) ** 2 / c.T
-            res += (values[vars[f"tot_service_{t}"]]
-                    - values[vars[f"tot_service_{t-1}"]]) ** 2 / c.T
+            res += (values[vars[agg("tot_arrival", "arrival", t)]]
+                    - values[vars[agg("tot_arrival", "arrival", t-1)]]) ** 2 \
+                / c.T
+            res += (values[vars[agg("tot_service", "service", t)]]
+                    - values[vars[agg("tot_service", "service", t-1)]]) ** 2 \
+                / c.T
             res += (values[vars[f"wasted_{t}"]]
                     - values[vars[f"wasted_{t-1}"]]) ** 2 / c.T
             for n in range(c.N):
@@ -446,8 +455,10 @@ def simplify_solution(c: ModelConfig,
     # make a big semantic difference. So get rid of those
     tol = 1e-9
     for t in range(1, c.T):
-        if res[f"tot_lost_{t}"] - res[f"tot_lost_{t-1}"] <= 4 * tol:
-            res[f"tot_lost_{t}"] = res[f"tot_lost_{t-1}"]
+        lost, lost_prev = agg("tot_lost", "losts", t), \
+            agg("tot_lost", "losts", t-1)
+        if res[lost] - res[lost_prev] <= 4 * tol:
+            res[lost] = res[lost_prev]
         for n in range(c.N):
             if res[f"loss_detected_{n},{t}"] - res[f"loss_detected_{n},{t-1}"]\
                <= 4 * tol:
@@ -1,9 +1,34 @@
 import argparse
-from typing import Optional, Union
+from fractions import Fraction
+import math
+from typing import Any, List, Optional, Union
+import warnings
 import z3
 
+# Largest denominator `exact` uses when converting floats
+MAX_DENOMINATOR = 10**4
+
+
+def exact(x: Any, max_denominator: int = MAX_DENOMINATOR) -> Any:
+    ''' Convert a float (or int) to the Fraction with the smallest denominator
+    that is at most `max_denominator` and equal to it as a float. If there is
+    none, use the closest such Fraction and warn. Other values (None,
+    Fractions, z3 expressions) are returned as is. Binary floats like 1/3 would
+    otherwise enter z3 as rationals with huge denominators, which slow down
+    exact simplex arithmetic '''
+    if isinstance(x, bool) or not isinstance(x, (int, float)):
+        return x
+    res = Fraction(x).limit_denominator(max_denominator)
+    if float(res) != x:
+        warnings.warn(f"{x} is not exactly representable with a denominator "
+                      f"<= {max_denominator}. Using {res}")
+    return res
+
 
 class ModelConfig:
+    # Numeric parameters that are stored as exact Fractions (see `exact`)
+    EXACT_PARAMS = ["C", "buf_min", "buf_max", "dupacks", "alpha"]
+
     # Number of flows
     N: int
     # Jitter parameter (in timesteps)
@@ -37,9 +62,47 @@ class ModelConfig:
     # Whether AIMD can additively increase irrespective of losses. If true, the
     # the algorithm is more like cubic and has interesting failure modes
     aimd_incr_irrespective: bool
+    # Whether AIMD's can_incr shares the "cwnd unchanged since t-dt" prefixes
+    # through chained Bools (O(N T^2) atoms instead of O(N T^3))
+    aimd_incr_chained: bool
+    # Fixed start phase of every BBR flow. None leaves them to the solver as
+    # Ints (see bbr_split.py for solving each phase separately)
+    bbr_start_phases: Optional[List[int]]
+    # Whether Copa declares named incr_allowed/decr_allowed Bools for every
+    # delay, so plot_model can print them. Off, the same conditions are
+    # encoded without auxiliary variables
+    copa_debug: bool
+    # Whether cwnd_rate_arrival encodes its min/max as linear bounds with a
+    # disjunction selecting the attained operand instead of nested If terms
+    arrival_selectors: bool
+    # How many timesteps back loss_detected bounds Ld from above. Older losses
+    # are still detected, but may also be detected when they should not be,
+    # so a smaller window is a relaxation. It only drops the upper bounds,
+    # i.e. fewer than half of the O(T^2) loss detection constraints.
+    # None means the full horizon (exact), "auto" derives it from D, C and
+    # buf_max (see `loss_window_len`)
+    loss_window: Optional[Union[int, str]]
+    # Number of queueing delays tracked exactly by qdel. Delays >= qdel_window
+    # are lumped into a single overflow Bool per timestep. None means T, which
+    # is exact. A smaller window is an opt-in approximation: Copa and
+    # multi_flows only know that an overflow delay is >= qdel_window, so they
+    # allow the most permissive delay in that range. This over-approximates
+    # the model: unsat results still hold, but sat ones may be spurious
+    qdel_window: Optional[int]
+    # SMT logic to specialise the solver for ("auto" to detect it from the
+    # assertions, including the query's, when the solver is checked). None
+    # uses z3's generic solver
+    logic: Optional[str]
+    # Preprocessing tactics run before the core solver when `logic` is set.
+    # None picks logic.DEFAULT_TACTICS
+    tactics: Optional[List[str]]
+    # Whether to derive and assert interval bounds for the Reals in Variables
+    # before solving (see presolve.py)
+    presolve: bool
+    # If N == 1, make the aggregates (A, S, L) aliases for the per-flow values
+    # instead of separate variables tied to them with equalities
+    alias_aggregates: bool
 
-    # These config variables are calculated automatically
-    calculate_qdel: bool
     #behrooz: Added to be able to compare with original model
     enhancement: bool
 
@@ -60,12 +123,67 @@ class ModelConfig:
                  unsat_core: bool,
                  simplify: bool,
                  aimd_incr_irrespective: bool = False,
-                 enhancement: bool = True):
+                 enhancement: bool = True,
+                 loss_window: Optional[Union[int, str]] = None,
+                 qdel_window: Optional[int] = None,
+                 logic: Optional[str] = None,
+                 tactics: Optional[List[str]] = None,
+                 presolve: bool = False,
+                 alias_aggregates: bool = False,
+                 aimd_incr_chained: bool = False,
+                 bbr_start_phases: Optional[List[int]] = None,
+                 copa_debug: bool = False,
+                 arrival_selectors: bool = False):
         self.__dict__ = locals()
-        self.calculate_qdel = cca in ["copa"] or N > 1
+        for p in self.EXACT_PARAMS:
+            setattr(self, p, self.__dict__[p])
+
+    def __setattr__(self, name: str, val: Any):
+        if name in self.EXACT_PARAMS:
+            val = exact(val)
+        super().__setattr__(name, val)
+
+    @property
+    def calculate_qdel(self) -> bool:
+        ''' Derived from the CCA and N, so it never goes stale when they
+        change '''
+        return self.qdel_needed()
+
+    def qdel_needed(self) -> bool:
+        ''' Whether the CCA or multiple flows need Variables.qdel '''
+        # Imported here since cca_registry depends on this module
+        from cca_registry import get_cca
+        return get_cca(self.cca).needs_qdel or self.N > 1
+
+    def aggregates_aliased(self) -> bool:
+        return self.alias_aggregates and self.N == 1
+
+    def loss_window_len(self) -> int:
+        ''' Number of look-back steps used by loss_detected. With a finite
+        buffer in the composing model, every byte accepted at time u has been
+        serviced by u + D + buf_max / C, so older comparisons rarely constrain
+        anything. '''
+        if self.loss_window is None:
+            return self.T
+        if self.loss_window == "auto":
+            if self.buf_max is None or not self.compose:
+                return self.T
+            return min(self.T,
+                       self.D + math.ceil(self.buf_max / self.C) + 1)
+        assert (int(self.loss_window) >= 1)
+        return min(self.T, int(self.loss_window))
+
+    def qdel_window_len(self) -> int:
+        ''' Number of exactly tracked queueing delays in Variables.qdel '''
+        if self.qdel_window is None:
+            return self.T
+        assert (self.qdel_window >= 1)
+        return min(self.T, self.qdel_window)
 
     @staticmethod
     def get_argparse() -> argparse.ArgumentParser:
+        # Imported here since cca_registry depends on this module
+        from cca_registry import registered_ccas
         parser = argparse.ArgumentParser(add_help=False)
         parser.add_argument("-N", "--num-flows", type=int, default=1)
         parser.add_argument("-D", type=int, default=1)
@@ -79,7 +197,7 @@ class ModelConfig:
             "--cca",
             type=str,
             default="const",
-            choices=["const", "aimd", "copa", "bbr", "fixed_d", "any"])
+            choices=registered_ccas())
         parser.add_argument("--no-compose", action="store_true")
         parser.add_argument("--alpha", type=float, default=None)
         parser.add_argument("--pacing",
@@ -95,6 +213,22 @@ class ModelConfig:
         parser.add_argument("--simplify", action="store_true")
         parser.add_argument("--aimd-incr-irrespective", action="store_true")
         parser.add_argument("--enhancement", default=False, type=bool)
+        parser.add_argument("--loss-window", type=str, default=None,
+                            help="Look-back of loss detection upper bounds "
+                            "(int or 'auto'). Smaller values relax the model")
+        parser.add_argument("--qdel-window", type=int, default=None,
+                            help="Number of exactly tracked queueing delays. "
+                            "Smaller than T over-approximates the model")
+        parser.add_argument("--logic", type=str, default=None)
+        parser.add_argument("--tactics", type=str, default=None,
+                            help="Comma-separated preprocessing tactics")
+        parser.add_argument("--presolve", action="store_true")
+        parser.add_argument("--alias-aggregates", action="store_true")
+        parser.add_argument("--aimd-incr-chained", action="store_true")
+        parser.add_argument("--bbr-start-phases", type=str, default=None,
+                            help="Comma-separated start phase of each flow")
+        parser.add_argument("--copa-debug", action="store_true")
+        parser.add_argument("--arrival-selectors", action="store_true")
         return parser
 
     @classmethod
@@ -102,7 +236,21 @@ class ModelConfig:
         return cls(args.num_flows, args.D, args.rtt, args.time, args.rate,
                    args.buf_min, args.buf_max, args.dupacks, args.cca,
                    not args.no_compose, args.alpha, args.pacing, args.epsilon,
-                   args.unsat_core, args.simplify, args.aimd_incr_irrespective,args.enhancement)
+                   args.unsat_core, args.simplify, args.aimd_incr_irrespective,args.enhancement,
+                   cls._parse_loss_window(args.loss_window), args.qdel_window,
+                   args.logic,
+                   None if args.tactics is None else args.tactics.split(","),
+                   args.presolve,
+                   args.alias_aggregates, args.aimd_incr_chained,
+                   None if args.bbr_start_phases is None else
+                   [int(x) for x in args.bbr_start_phases.split(",")],
+                   args.copa_debug, args.arrival_selectors)
+
+    @staticmethod
+    def _parse_loss_window(x: Optional[str]) -> Optional[Union[int, str]]:
+        if x is None or x == "auto":
+            return x
+        return int(x)
 
     @classmethod
     def default(cls):
@@ -1,8 +1,9 @@
+from fractions import Fraction
 from z3 import And, Or
 
+from cache import run_query
 from config import ModelConfig
-from model import make_solver
-from pyz3_utils import run_query
+from template import make_solver_cached
 
 
 def prove_steady_state(timeout=10):
@@ -14,18 +15,17 @@ def prove_steady_state(timeout=10):
     # fall. Otherwise, this assumption is not needed (of course, we *can* make
     # the assumption if we want)
     c.compose = True
-    c.calculate_qdel = True
 
     # The last cwnd value that is chosen completely freely. We'll treat this as
     # the initial cwnd
     dur = c.R + c.D - 1
 
     # If cwnd > 4 BDP + alpha, cwnd wil decrease by at-least alpha
-    s, v = make_solver(c)
+    s, v = make_solver_cached(c)
     # Lemma's assumption
     # We are looking at infinite buffer, no loss case here and in the paper
     s.add(And(v.L[0] == 0, v.L[-1] == 0))
-    s.add(v.alpha < (1 / 3) * c.C * c.R)
+    s.add(v.alpha < Fraction(1, 3) * c.C * c.R)
     s.add(v.c_f[0][dur] > 4*c.C*c.R + v.alpha)
     # Lemma's statement's converse
     s.add(v.c_f[0][-1] >= v.c_f[0][dur] - v.alpha)
@@ -36,10 +36,10 @@ def prove_steady_state(timeout=10):
 
     # If queue length is > 4 BDP + 2 alpha and cwnd < 4 BDP + alpha, queue
     # length decreases by at-least alpha and cwnd will not increase its bound
-    s, v = make_solver(c)
+    s, v = make_solver_cached(c)
     # Lemma's assumption
     s.add(And(v.L[0] == 0, v.L[-1] == 0))
-    s.add(v.alpha < (1 / 5) * c.C * c.R)
+    s.add(v.alpha < Fraction(1, 5) * c.C * c.R)
     s.add(v.c_f[0][dur] <= 4*c.C*c.R + v.alpha)
     s.add(v.A[0] - v.S[0] > 4*c.C*c.R + 2*v.alpha)
     # Lemma's statement's converse
@@ -56,10 +56,10 @@ def prove_steady_state(timeout=10):
     # by at-least alpha and queue length does not increase its bound
     c.T = 15
     c.compose = False  # we definitely need it to prove cwnd increases
-    s, v = make_solver(c)
+    s, v = make_solver_cached(c)
     # Lemma's assumption
     s.add(And(v.L[0] == 0, v.L[-1] == 0))
-    s.add(v.alpha < (1 / 4) * c.C * c.R)
+    s.add(v.alpha < Fraction(1, 4) * c.C * c.R)
     s.add(v.c_f[0][dur] < c.C*c.R - v.alpha)
     s.add(v.A[0] - v.S[0] <= 4*c.C*c.R + 2*v.alpha)
     # Lemma's statement's converse
@@ -77,10 +77,10 @@ def prove_steady_state(timeout=10):
     # If Copa has entered steady state, it does not leave it
     c.T = 10
     c.compose = False
-    s, v = make_solver(c)
+    s, v = make_solver_cached(c)
     ors = []
     # Lemma's assumption
-    s.add(v.alpha < (1 / 7) * c.C * c.R)
+    s.add(v.alpha < Fraction(1, 7) * c.C * c.R)
     s.add(And(v.L[0] == 0, v.L[-1] == 0))
     s.add(v.c_f[0][dur] >= c.C*c.R - v.alpha)
     s.add(v.c_f[0][dur] <= 4*c.C*c.R + 2*v.alpha)
@@ -1,7 +1,10 @@
+from fractions import Fraction
 from z3 import And, Not, Or
 
+from bbr_split import run_phase_split
+from cca_registry import freedom_duration
 from config import ModelConfig
-from model import make_solver, min_send_quantum
+from model import make_solver, make_variant_solver, min_send_quantum
 from plot import plot_model
 from pyz3_utils import MySolver, run_query
 from utils import make_periodic
@@ -28,8 +31,8 @@ def bbr_low_util(timeout=10):
     # Consider the no loss case for simplicity
     s.add(v.L[0] == 0)
     # Ask for < 10% utilization. Can be made arbitrarily small
-    s.add(v.S[-1] - v.S[0] < 0.1 * c.C * c.T)
-    make_periodic(c, s, v, 2 * c.R)
+    s.add(v.S[-1] - v.S[0] < Fraction(1, 10) * c.C * c.T)
+    make_periodic(c, s, v, freedom_duration(c))
     qres = run_query(c, s, v, timeout)
     print(qres.satisfiable)
     if str(qres.satisfiable) == "sat":
@@ -50,13 +53,13 @@ def bbr_test(timeout=10):
     # Consider the no loss case for simplicity
     s.add(v.L[0] == 0)
     # Ask for < 10% utilization. Can be made arbitrarily small
-    #s.add(v.S[-1] - v.S[0] < 0.1 * c.C * c.T)
-    s.add(v.L[-1] - v.L[0] >= 0.5 * (v.S[-1] - v.S[0]))
+    #s.add(v.S[-1] - v.S[0] < Fraction(1, 10) * c.C * c.T)
+    s.add(v.L[-1] - v.L[0] >= Fraction(1, 2) * (v.S[-1] - v.S[0]))
     s.add(v.A[0] == 0)
     s.add(v.r_f[0][0] < c.C)
     s.add(v.r_f[0][1] < c.C)
     s.add(v.r_f[0][2] < c.C)
-    make_periodic(c, s, v, 2 * c.R)
+    make_periodic(c, s, v, freedom_duration(c))
     qres = run_query(c, s, v, timeout)
     print(qres.satisfiable)
     if str(qres.satisfiable) == "sat":
@@ -75,15 +78,14 @@ def copa_low_util(timeout=10):
     c.compose = False
     c.cca = "copa"
     c.simplify = False
-    c.calculate_qdel = True
     c.unsat_core = False
     c.T = 10
     s, v = make_solver(c)
     # Consider the no loss case for simplicity
     s.add(v.L[0] == v.L[-1])
     # 10% utilization. Can be made arbitrarily small
-    s.add(v.S[-1] - v.S[0] < 0.1 * c.C * c.T)
-    make_periodic(c, s, v, c.R + c.D)
+    s.add(v.S[-1] - v.S[0] < Fraction(1, 10) * c.C * c.T)
+    make_periodic(c, s, v, freedom_duration(c))
 
     print(s.to_smt2(), file = open("/tmp/ccac.smt2", "w"))
     s.check()
@@ -140,7 +142,7 @@ t  W              S              A              L              Ld_f_0         c_
     s.add(v.L[0] == 0)
     # Restrict alpha to small values, otherwise CCAC can output obvious and
     # uninteresting behavior
-    s.add(v.alpha <= 0.1 * c.C * c.R)
+    s.add(v.alpha <= Fraction(1, 10) * c.C * c.R)
     # Does there exist a time where loss happened while cwnd <= 1?
     conds = []
     for t in range(2, c.T - 1):
@@ -216,7 +218,7 @@ t  W              S              A              L              Ld_f_0         c_
     s.add(v.L[0] == 0)
     # Restrict alpha to small values, otherwise CCAC can output obvious and
     # uninteresting behavior
-    s.add(v.alpha <= 0.1 * c.C * c.R)
+    s.add(v.alpha <= Fraction(1, 10) * c.C * c.R)
     #Behrooz: forcing three dup acks as it is a variable.
     s.add(v.dupacks == 3 * v.alpha)
     # Does there exist a time where loss happened while cwnd <= 1?
@@ -304,7 +306,7 @@ Also as we see timeout happens! We can now use T=4 and use original exit conditi
     # Lemma's assumption
     s.add(v.L_f[0][0] - v.Ld_f[0][0] <= max_undet(v))
     s.add(v.c_f[0][0] <= max_cwnd(v))
-    s.add(v.alpha < 1 / 3)
+    s.add(v.alpha < Fraction(1, 3))
     # Lemma's statement's converse
     #original exit condition
     #s.add(Or(
@@ -387,7 +389,7 @@ t  W              S              A              L              Ld_f_0         c_
     #min_send_quantum(c, s, v)
     s.add(v.L[0] == 0)
     s.add(v.dupacks == 3 * v.alpha)
-    s.add(v.alpha < 1 / 3)
+    s.add(v.alpha < Fraction(1, 3))
 
     #original proof. only forces at 0
     s.add(v.L_f[0][0] - v.Ld_f[0][0] <= max_undet(v))
@@ -427,7 +429,52 @@ t  W              S              A              L              Ld_f_0         c_
                 f.write(f"{var} = {val}\n")
         plot_model(qres.model, c, qres.v)
 
-def bbr_low_util_enhanced(timeout=240):
+def aimd_steady_state_compare(timeout=60):
+    '''Runs the steady state check of aimd_steady_state on the original and the
+    enhanced model using a single solver. The two models only differ in the
+    constraints guarded by the variant literals.
+    '''
+    from model import Variables
+    def max_cwnd(v: Variables):
+        return c.C*(c.R + c.D) + c.buf_min + v.alpha
+
+    def max_undet(v: Variables):
+        return c.C*(c.R + c.D) + v.alpha
+
+    c = ModelConfig.default()
+    c.buf_min = 1
+    c.buf_max = 1
+    c.cca = "aimd"
+    c.T = 10
+    s, v, lits = make_variant_solver(c, {
+        "original": {"enhancement": False},
+        "enhanced": {"enhancement": True}})
+    s.add(v.L_f[0][0] - v.Ld_f[0][0] <= max_undet(v))
+    s.add(v.c_f[0][0] <= max_cwnd(v))
+    s.add(v.alpha < Fraction(1, 3))
+    s.add(Or(*[v.c_f[0][t] > max_cwnd(v) for t in range(2, c.T)]))
+    s.s.set(timeout=int(timeout * 1000))
+
+    for name, lit in lits.items():
+        print(name, s.s.check(lit))
+
+
+def bbr_low_util_enhanced_query(c: ModelConfig):
+    s, v = make_solver(c)
+    for t in range(c.T):
+        s.add(Not(v.timeout_f[0][t]))
+
+    # Consider the no loss case for simplicity
+    s.add(v.L[0] == 0)
+    # Ask for < 10% utilization. Can be made arbitrarily small
+    s.add(v.S[-1] - v.S[0] < Fraction(1, 10) * c.C * c.T)
+    make_periodic(c, s, v, freedom_duration(c))
+    return s, v
+
+
+def bbr_low_util_enhanced(timeout=240, parallel=False):
+    ''' If `parallel`, solve one sub-query per BBR start phase in a process
+    pool (see bbr_split.py) '''
     c = ModelConfig.default()
     c.compose = True
     c.cca = "bbr"
@@ -441,20 +488,40 @@ def bbr_low_util_enhanced(timeout=240):
     c.C=1
     c.D=1
     c.R=1
-    s, v = make_solver(c)
-    for t in range(c.T):
-        s.add(Not(v.timeout_f[0][t]))
-
-    # Consider the no loss case for simplicity
-    s.add(v.L[0] == 0)
-    # Ask for < 10% utilization. Can be made arbitrarily small
-    s.add(v.S[-1] - v.S[0] < 0.1 * c.C * c.T)
-    make_periodic(c, s, v, 2 * c.R)
+    if parallel:
+        res = run_phase_split(c, bbr_low_util_enhanced_query, timeout)
+        print(res.satisfiable, res.phases)
+        if res.qres is not None:
+            plot_model(res.qres.model, res.cfg, res.qres.v)
+        return
+    s, v = bbr_low_util_enhanced_query(c)
     qres = run_query(c, s, v, timeout)
     print(qres.satisfiable)
     if str(qres.satisfiable) == "sat":
         plot_model(qres.model, c, qres.v)
 
+def exact_params_benchmark(timeout=60):
+    ''' Solve time of the first Copa steady-state lemma (see copa_proofs.py)
+    when its constants are binary floats versus small-denominator Fractions.
+    Every other parameter goes through ModelConfig, so it is exact in both
+    runs '''
+    import time
+
+    c = ModelConfig.default()
+    c.cca = "copa"
+    c.compose = True
+    dur = c.R + c.D - 1
+    for name, third in [("float", 1 / 3), ("exact", Fraction(1, 3))]:
+        s, v = make_solver(c)
+        s.add(And(v.L[0] == 0, v.L[-1] == 0))
+        s.add(v.alpha < third * c.C * c.R)
+        s.add(v.c_f[0][dur] > 4 * c.C * c.R + v.alpha)
+        s.add(v.c_f[0][-1] >= v.c_f[0][dur] - v.alpha)
+        start = time.time()
+        qres = run_query(c, s, v, timeout)
+        print(f"{name}: {qres.satisfiable} in {time.time() - start:.2f}s")
+
+
 if __name__ == "__main__":
     #aimd_premature_loss() #This is the original query authors provided.
     #aimd_premature_loss_enhanced() #This is enhanced model and query
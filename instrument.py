@@ -0,0 +1,153 @@
+''' Opt-in instrumentation of formula construction. InstrumentedSolver
+attributes every assertion and declaration to the generator function that
+made it (e.g. `loss_detected` or `can_incr`) and reports, per generator, the
+formula size and the Python time spent building it '''
+
+import sys
+import time
+from typing import Dict, List, Optional
+import z3
+
+from config import ModelConfig
+from pyz3_utils import MySolver, QueryResult, run_query
+from variables import Variables
+
+
+class GeneratorStats:
+    # Name of the generator function
+    name: str
+    # Number of assertions added
+    assertions: int
+    # Number of If / Implies nodes in those assertions
+    ifs: int
+    implies: int
+    # Number of Bool / Real / Int variables declared
+    bool_vars: int
+    real_vars: int
+    int_vars: int
+    # Number of AST nodes in the assertions. Shared subterms are counted once
+    # per assertion
+    ast_nodes: int
+    # Wall-clock time (in seconds) spent building the assertions. This
+    # excludes the time spent in instrumentation
+    build_time: float
+
+    def __init__(self, name: str):
+        self.name = name
+        self.assertions = 0
+        self.ifs = 0
+        self.implies = 0
+        self.bool_vars = 0
+        self.real_vars = 0
+        self.int_vars = 0
+        self.ast_nodes = 0
+        self.build_time = 0
+
+    def to_dict(self) -> Dict[str, float]:
+        return dict(self.__dict__)
+
+
+class InstrumentedSolver(MySolver):
+    ''' A MySolver that records GeneratorStats. Time between two calls to
+    add/Real/Bool/Int is charged to the generator making the second call '''
+
+    def __init__(self):
+        super().__init__()
+        self.stats: Dict[str, GeneratorStats] = {}
+        self.last_time = time.perf_counter()
+
+    def _charge(self) -> GeneratorStats:
+        now = time.perf_counter()
+        # Frame 0 is _charge, 1 is add/Real/..., 2 is the generator. Skip
+        # frames of comprehensions inside the generator
+        frame = sys._getframe(2)
+        while frame.f_code.co_name.startswith("<") \
+                and frame.f_back is not None:
+            frame = frame.f_back
+        code = frame.f_code
+        name = getattr(code, "co_qualname", code.co_name)
+        if name not in self.stats:
+            self.stats[name] = GeneratorStats(name)
+        st = self.stats[name]
+        st.build_time += now - self.last_time
+        return st
+
+    def _done(self):
+        self.last_time = time.perf_counter()
+
+    def add(self, expr):
+        st = self._charge()
+        st.assertions += 1
+        visited = set()
+        stack: List[z3.ExprRef] = [expr]
+        while len(stack) > 0:
+            e = stack.pop()
+            if e.get_id() in visited:
+                continue
+            visited.add(e.get_id())
+            st.ast_nodes += 1
+            if z3.is_app_of(e, z3.Z3_OP_ITE):
+                st.ifs += 1
+            elif z3.is_app_of(e, z3.Z3_OP_IMPLIES):
+                st.implies += 1
+            stack.extend(e.children())
+        super().add(expr)
+        self._done()
+
+    def Real(self, name: str):
+        self._charge().real_vars += 1
+        res = super().Real(name)
+        self._done()
+        return res
+
+    def Bool(self, name: str):
+        self._charge().bool_vars += 1
+        res = super().Bool(name)
+        self._done()
+        return res
+
+    def Int(self, name: str):
+        self._charge().int_vars += 1
+        res = super().Int(name)
+        self._done()
+        return res
+
+    def report(self) -> List[Dict[str, float]]:
+        ''' Per-generator statistics, largest first '''
+        return [st.to_dict() for st in
+                sorted(self.stats.values(), key=lambda x: -x.ast_nodes)]
+
+
+def format_report(report: List[Dict[str, float]]) -> str:
+    cols = ["name", "assertions", "ifs", "implies", "bool_vars", "real_vars",
+            "int_vars", "ast_nodes", "build_time"]
+    lines = [("{:<28}" + "{:>12}" * (len(cols) - 1)).format(*cols)]
+    for r in report:
+        vals = [r[x] for x in cols]
+        vals[-1] = "%.4f" % vals[-1]
+        lines.append(("{:<28}" + "{:>12}" * (len(cols) - 1)).format(*vals))
+    return "\n".join(lines)
+
+
+def run_query_instrumented(c: ModelConfig, s: MySolver, v: Variables,
+                           timeout: float = 10) -> QueryResult:
+    ''' run_query, but also attaches the build report (if s was instrumented)
+    to the result as `build_report` '''
+    report: Optional[List[Dict[str, float]]] = None
+    if isinstance(s, InstrumentedSolver):
+        report = s.report()
+    qres = run_query(c, s, v, timeout)
+    qres.build_report = report
+    return qres
+
+
+if __name__ == "__main__":
+    from model import make_solver
+
+    c = ModelConfig.default()
+    c.cca = "aimd"
+    c.buf_min = 1
+    c.buf_max = 1
+    c.T = 15
+    s, v = make_solver(c, InstrumentedSolver())
+    print(format_report(s.report()))
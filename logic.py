@@ -0,0 +1,159 @@
+''' Detect the SMT logic an encoding uses and build a solver specialised for
+it. Most configurations are pure QF_LRA with Booleans; only some CCAs (e.g.
+BBR's start state) add Ints '''
+
+from typing import Any, Dict, List, Optional, Tuple
+import z3
+
+from pyz3_utils import MySolver
+
+# Preprocessing applied before the core solver when no pipeline is given
+DEFAULT_TACTICS = ["simplify", "propagate-values", "solve-eqs",
+                   "elim-uncnstr"]
+
+
+def detect_logic(assertions: List[z3.BoolRef]) -> str:
+    ''' Returns one of QF_LRA, QF_LIA, QF_LIRA, QF_NRA, QF_NIA, QF_NIRA '''
+    has_int, has_real, nonlinear = False, False, False
+    visited = set()
+    stack: List[z3.ExprRef] = list(assertions)
+    while len(stack) > 0:
+        e = stack.pop()
+        if e.get_id() in visited:
+            continue
+        visited.add(e.get_id())
+        if z3.is_const(e) and not z3.is_bool(e):
+            if z3.is_int(e):
+                has_int = True
+            elif z3.is_real(e):
+                has_real = True
+        elif z3.is_app_of(e, z3.Z3_OP_MUL):
+            if sum(1 for x in e.children() if not z3.is_rational_value(x)
+                   and not z3.is_int_value(x)) > 1:
+                nonlinear = True
+        elif z3.is_app_of(e, z3.Z3_OP_DIV) or z3.is_app_of(e, z3.Z3_OP_IDIV)\
+                or z3.is_app_of(e, z3.Z3_OP_MOD):
+            den = e.children()[1]
+            if not z3.is_rational_value(den) and not z3.is_int_value(den):
+                nonlinear = True
+        stack.extend(e.children())
+
+    arith = "N" if nonlinear else "L"
+    if has_int and has_real:
+        return f"QF_{arith}IRA"
+    if has_int:
+        return f"QF_{arith}IA"
+    return f"QF_{arith}RA"
+
+
+def join_logics(a: str, b: str) -> str:
+    ''' The smallest of the logics detect_logic returns that contains both a
+    and b '''
+    nonlinear = "N" in [a[3], b[3]]
+    sorts = set(a[4:]) | set(b[4:])
+    arith = "N" if nonlinear else "L"
+    if "I" in sorts and "R" in sorts:
+        return f"QF_{arith}IRA"
+    if "I" in sorts:
+        return f"QF_{arith}IA"
+    return f"QF_{arith}RA"
+
+
+def make_logic_solver(logic: str,
+                      tactics: Optional[List[str]] = None) -> z3.Solver:
+    ''' A solver for `logic` that first runs the `tactics` pipeline. An empty
+    pipeline gives z3's default solver for the logic '''
+    if tactics is None:
+        tactics = DEFAULT_TACTICS
+    if len(tactics) == 0:
+        return z3.SolverFor(logic)
+    # z3 ships logic-specific tactics for most of these (e.g. "qflra")
+    core = logic.lower().replace("_", "")
+    if core not in z3.tactics():
+        core = "smt"
+    pipeline = [z3.Tactic(t) for t in tactics] + [z3.Tactic(core)]
+    return z3.Then(*pipeline).solver()
+
+
+class LazyLogicSolver:
+    ''' Stands in for the z3 solver of a MySolver when the logic is detected
+    automatically. Assertions are only collected until `check`, which detects
+    the logic of all of them, including the query's property added after
+    make_solver, and solves with a solver specialised for that logic. If
+    later assertions leave the logic, the next `check` switches to a solver
+    for the wider one. Anything else (model, statistics, ...) is forwarded to
+    the solver of the last `check` '''
+
+    def __init__(self, owner: MySolver, tactics: List[str]):
+        self.owner = owner
+        self.tactics = tactics
+        # Holds every assertion, so they can be replayed into a new solver
+        self.recorded = z3.Solver()
+        self.solver: Optional[z3.Solver] = None
+        self.logic: Optional[str] = None
+        # Number of recorded assertions that self.solver has seen
+        self.num_seen = 0
+        self.settings: List[Tuple[Tuple[Any, ...], Dict[str, Any]]] = []
+
+    def add(self, *args):
+        self.recorded.add(*args)
+
+    def assertions(self) -> z3.AstVector:
+        return self.recorded.assertions()
+
+    def sexpr(self) -> str:
+        return self.recorded.sexpr()
+
+    def set(self, *args, **kwds):
+        self.settings.append((args, kwds))
+        if self.solver is not None:
+            self.solver.set(*args, **kwds)
+
+    def check(self, *assumptions) -> z3.CheckSatResult:
+        assertions = list(self.recorded.assertions())
+        new = assertions[self.num_seen:]
+        logic = detect_logic(new)
+        if self.logic is not None:
+            logic = join_logics(self.logic, logic)
+        if self.solver is None or logic != self.logic:
+            self.solver = make_logic_solver(logic, self.tactics)
+            for args, kwds in self.settings:
+                self.solver.set(*args, **kwds)
+            new = assertions
+        self.solver.add(new)
+        self.num_seen = len(assertions)
+        self.logic = logic
+        self.owner.logic = logic
+        return self.solver.check(*assumptions)
+
+    def __getattr__(self, name: str) -> Any:
+        # Read through __dict__, since this is also called for attributes
+        # looked up before __init__ (e.g. when unpickling)
+        if self.__dict__.get("solver") is None:
+            raise AttributeError(
+                f"'{name}' is only available after check()")
+        return getattr(self.solver, name)
+
+
+def specialise_solver(s: MySolver, logic: str,
+                      tactics: Optional[List[str]] = None):
+    ''' Replace the solver underlying `s` by one specialised for `logic`. The
+    choice is recorded in `s.logic` and `s.tactics`. With "auto", the logic
+    is detected when the query is checked (see LazyLogicSolver), so
+    assertions added afterwards are accounted for. An explicit logic is
+    trusted: the caller must not add terms outside it '''
+    assertions = s.s.assertions()
+    if tactics is None:
+        tactics = DEFAULT_TACTICS
+    if logic == "auto":
+        lazy = LazyLogicSolver(s, tactics)
+        lazy.add(assertions)
+        s.s = lazy
+        s.logic = "auto"
+        s.tactics = tactics
+        return
+    new = make_logic_solver(logic, tactics)
+    new.add(assertions)
+    s.s = new
+    s.logic = logic
+    s.tactics = tactics
@@ -1,11 +1,14 @@
-from typing import Optional, Tuple
-from z3 import And, Sum, Implies, Or, Not, If
+from copy import copy
+from fractions import Fraction
+from typing import Any, Dict, List, Optional, Tuple
+from z3 import And, BoolRef, Sum, Implies, Or, Not, If
 
-from cca_aimd import cca_aimd
-from cca_bbr import cca_bbr
-from cca_copa import cca_copa
+from cca_registry import freedom_duration, get_cca
 from config import ModelConfig
+from logic import specialise_solver
+from presolve import propagate_bounds
 from pyz3_utils import MySolver
+from utils import RecordingSolver
 from variables import Variables
 
 
@@ -41,6 +44,8 @@ def initial(c: ModelConfig, s: MySolver, v: Variables):
 
 def relate_tot(c: ModelConfig, s: MySolver, v: Variables):
     ''' Relate total values to per-flow values '''
+    if c.aggregates_aliased():
+        return
     for t in range(c.T):
         s.add(v.A[t] == Sum([v.A_f[n][t] for n in range(c.N)]))
         s.add(v.L[t] == Sum([v.L_f[n][t] for n in range(c.N)]))
@@ -93,6 +98,14 @@ def network(c: ModelConfig, s: MySolver, v: Variables):
 
 
 def loss_detected(c: ModelConfig, s: MySolver, v: Variables):
+    # Losses older than the window only get the lower bound on Ld_f, so
+    # detectable losses are always detected. The upper bounds (undetectable
+    # losses are not detected) are dropped beyond the window. This is a
+    # relaxation: it admits a superset of the exact traces. It only removes
+    # the upper bounds, so the encoding is still O(N T^2): about (T-R)^2 / 2
+    # lower bounds plus (T-R) * window upper bounds per flow, instead of
+    # (T-R)^2. With the default window (= T) the encoding is exact.
+    window = c.loss_window_len()
     for n in range(c.N):
         for t in range(c.T):
             for dt in range(c.T):
@@ -105,6 +118,8 @@ def loss_detected(c: ModelConfig, s: MySolver, v: Variables):
                 s.add(
                     Implies(And(Not(v.timeout_f[n][t]), detectable),
                             v.Ld_f[n][t] >= v.L_f[n][t - c.R - dt]))
+                if dt >= window:
+                    continue
                 s.add(
                     Implies(And(Not(v.timeout_f[n][t]), Not(detectable)),
                             v.Ld_f[n][t] <= v.L_f[n][t - c.R - dt]))
@@ -150,8 +165,9 @@ def loss_detected(c: ModelConfig, s: MySolver, v: Variables):
 def calculate_qdel(c: ModelConfig, s: MySolver, v: Variables):
     # Figure out the time when the bytes being output at time t were
     # first input
+    Q = c.qdel_window_len()
     for t in range(c.T):
-        for dt in range(c.T):
+        for dt in range(Q):
             if dt > t:
                 s.add(Not(v.qdel[t][dt]))
                 continue
@@ -162,22 +178,41 @@ def calculate_qdel(c: ModelConfig, s: MySolver, v: Variables):
                         v.A[t - dt] - v.L[t - dt] >= v.S[t])),
                 And(v.S[t] == v.S[t - 1], v.qdel[t - 1][dt])))
 
+        if Q < c.T:
+            # The union of the qdel[t][dt] conditions for dt >= Q. Since A - L
+            # is monotone, the intervals are contiguous
+            if t <= Q:
+                s.add(Not(v.qdel_over[t]))
+            else:
+                s.add(v.qdel_over[t] == Or(
+                    And(
+                        v.S[t] != v.S[t - 1],
+                        v.A[0] - v.L[0] < v.S[t],
+                        v.A[t - Q] - v.L[t - Q] >= v.S[t]),
+                    And(v.S[t] == v.S[t - 1], v.qdel_over[t - 1])))
+
         # We don't know what happened at t < 0, so we'll let the solver pick
         # non-deterministically
-        s.add(
-            Implies(And(v.S[t] != v.S[t - 1], v.A[0] - v.L[0] < v.S[t - 1]),
+        if Q == c.T or 0 < t <= Q:
+            s.add(
+                Implies(
+                    And(v.S[t] != v.S[t - 1], v.A[0] - v.L[0] < v.S[t - 1]),
                     Not(v.qdel[t][t - 1])))
 
 
 def multi_flows(c: ModelConfig, s: MySolver, v: Variables):
     assert (c.calculate_qdel)
+    Q = c.qdel_window_len()
     for t in range(c.T):
         for n in range(c.N):
-            for dt in range(c.T):
+            for dt in range(Q):
                 if t - dt - 1 < 0:
                     continue
                 s.add(
                     Implies(v.qdel[t][dt], v.S_f[n][t] > v.A_f[n][t - dt - 1]))
+            if Q < c.T and t > Q:
+                # The weakest of the constraints for dt >= Q
+                s.add(Implies(v.qdel_over[t], v.S_f[n][t] > v.A_f[n][0]))
 
 
 def epsilon_alpha(c: ModelConfig, s: MySolver, v: Variables):
@@ -187,18 +222,40 @@ def epsilon_alpha(c: ModelConfig, s: MySolver, v: Variables):
         elif c.epsilon == "lt_alpha":
             s.add(v.epsilon < v.alpha)
         elif c.epsilon == "lt_half_alpha":
-            s.add(v.epsilon < v.alpha * 0.5)
+            s.add(v.epsilon < v.alpha * Fraction(1, 2))
         elif c.epsilon == "gt_alpha":
             s.add(v.epsilon > v.alpha)
         else:
             assert (False)
 
 
+def cwnd_rate_arrival_selectors(c: ModelConfig, s: MySolver, v: Variables,
+                                n: int, t: int):
+    ''' Same as the If terms in cwnd_rate_arrival, i.e. A = min(max(A_w,
+    A[t-1]), A_r), but as linear bounds. The disjunctions select which
+    operand of the min/max is attained, so the solver splits on them instead
+    of on If terms, without auxiliary variables '''
+    A = v.A_f[n][t]
+    A_prev = v.A_f[n][t - 1]
+    # Arrival due to cwnd (before the max with A_prev) and due to rate
+    A_w = v.S_f[n][t - c.R] + v.Ld_f[n][t] + v.c_f[n][t]
+    A_r = A_prev + v.r_f[n][t]
+    s.add(And(
+        # A <= min(max(A_w, A_prev), A_r)
+        A <= A_r, Or(A <= A_w, A <= A_prev),
+        # A >= min(max(A_w, A_prev), A_r). A >= A_prev is asserted by
+        # monotone
+        Or(A >= A_w, A >= A_r)))
+
+
 def cwnd_rate_arrival(c: ModelConfig, s: MySolver, v: Variables):
     for n in range(c.N):
         for t in range(c.T):
             if t >= c.R:
                 assert (c.R >= 1)
+                if c.arrival_selectors:
+                    cwnd_rate_arrival_selectors(c, s, v, n, t)
+                    continue
                 # Arrival due to cwnd
                 A_w = v.S_f[n][t - c.R] + v.Ld_f[n][t] + v.c_f[n][t]
                 A_w = If(A_w >= v.A_f[n][t - 1], A_w, v.A_f[n][t - 1])
@@ -238,17 +295,8 @@ def cca_const(c: ModelConfig, s: MySolver, v: Variables):
                 s.add(v.r_f[n][t] >= c.C * 100)
 
 
-def make_solver(c: ModelConfig,
-                s: Optional[MySolver] = None,
-                v: Optional[Variables] = None) -> Tuple[MySolver, Variables]:
-    if s is None:
-        s = MySolver()
-    if v is None:
-        v = Variables(c, s)
-
-    if c.unsat_core:
-        s.set(unsat_core=True)
-
+def make_network(c: ModelConfig, s: MySolver, v: Variables):
+    ''' The CCA-independent part of the model '''
     monotone(c, s, v)
     initial(c, s, v)
     relate_tot(c, s, v)
@@ -262,22 +310,79 @@ def make_solver(c: ModelConfig,
         multi_flows(c, s, v)
     cwnd_rate_arrival(c, s, v)
 
-    if c.cca == "const":
-        cca_const(c, s, v)
-    elif c.cca == "aimd":
-        cca_aimd(c, s, v)
-    elif c.cca == "bbr":
-        cca_bbr(c, s, v)
-    elif c.cca == "copa":
-        cca_copa(c, s, v)
-    elif c.cca == "any":
-        pass
-    else:
-        assert(False)
+
+def make_cca(c: ModelConfig, s: MySolver, v: Variables):
+    ''' The constraints of c.cca (see cca_registry) '''
+    get_cca(c.cca).encode(c, s, v)
+
+
+def make_solver(c: ModelConfig,
+                s: Optional[MySolver] = None,
+                v: Optional[Variables] = None) -> Tuple[MySolver, Variables]:
+    if s is None:
+        s = MySolver()
+    if v is None:
+        v = Variables(c, s)
+
+    if c.unsat_core:
+        s.set(unsat_core=True)
+
+    make_network(c, s, v)
+    make_cca(c, s, v)
+    if c.presolve:
+        s.presolve_report = propagate_bounds(c, s, v)
+
+    # Tactic solvers do not track assertions for unsat cores
+    if c.logic is not None and not c.unsat_core \
+            and not isinstance(s, RecordingSolver):
+        specialise_solver(s, c.logic, c.tactics)
 
     return (s, v)
 
 
+def make_variant_solver(
+        c: ModelConfig, variants: Dict[str, Dict[str, Any]],
+        s: Optional[MySolver] = None
+) -> Tuple[MySolver, Variables, Dict[str, BoolRef]]:
+    '''Build several model variants (e.g. {"original": {"enhancement": False},
+    "enhanced": {}}) into one solver. Each variant is a set of overrides to `c`
+    and gets an indicator literal `variant_<name>`. Constraints shared by all
+    variants are asserted directly, others are guarded by the literals of the
+    variants that generate them. Select a variant with
+    `s.s.check(lits[name])`; z3 keeps learned clauses across variants.
+
+    '''
+    if s is None:
+        s = MySolver()
+    if c.unsat_core:
+        s.set(unsat_core=True)
+
+    lits = {name: s.Bool(f"variant_{name}") for name in variants}
+    # Map from z3 AST id to the constraint and the variants that generate it
+    cons: Dict[int, Tuple[BoolRef, List[str]]] = {}
+    v = None
+    for name, overrides in variants.items():
+        cv = copy(c)
+        for k, val in overrides.items():
+            assert k in cv.__dict__, f"Unknown config parameter '{k}'"
+            setattr(cv, k, val)
+        r = RecordingSolver()
+        _, rv = make_solver(cv, r)
+        if v is None or (cv.calculate_qdel and not hasattr(v, "qdel")):
+            v = rv
+        s.variables |= r.variables
+        for e in r.recorded:
+            cons.setdefault(e.get_id(), (e, []))[1].append(name)
+
+    for e, names in cons.values():
+        if len(names) == len(variants):
+            s.add(e)
+        else:
+            s.add(Implies(Or(*[lits[n] for n in names]), e))
+    assert v is not None
+    return (s, v, lits)
+
+
 if __name__ == "__main__":
     from plot import plot_model
     from pyz3_utils import run_query
@@ -301,15 +406,15 @@ if __name__ == "__main__":
     c.aimd_incr_irrespective = True
 
     s, v = make_solver(c)
-    dur = c.R + c.D # + c.R + 2 * c.D
+    dur = freedom_duration(c)
     # Consider the no loss case for simplicity
     s.add(v.L[0] == 0)
-    s.add(v.alpha < 1 / 4)
+    s.add(v.alpha < Fraction(1, 4))
     # s.add(v.c_f[0][0] == v.c_f[1][0])
     # s.add(v.A_f[0][0] == v.A_f[1][0])
     # s.add(v.A_f[0][0] == 0)
     # s.add(v.L[dur] == 0)
-    s.add(v.S[-1] - v.S[0] < 0.5625 * c.C * (c.T - 1))
+    s.add(v.S[-1] - v.S[0] < Fraction(9, 16) * c.C * (c.T - 1))
     # s.add(v.S_f[0][-1] - v.S_f[1][-1] > 0.8 * c.C * c.T)
     make_periodic(c, s, v, dur)
     # cca_aimd_make_periodic(c, s, v)
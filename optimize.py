@@ -0,0 +1,119 @@
+''' Worst-case queries as optimization problems. Rather than asserting a fixed
+threshold (e.g. `S[-1]-S[0] < 0.1*C*T`) and bisecting on it, hand the
+objective to z3's optimization engine and get the extreme value along with a
+trace that attains it '''
+
+import time
+from fractions import Fraction
+from typing import Optional, Tuple
+import z3
+from z3.z3util import get_vars
+
+from config import ModelConfig
+from pyz3_utils import MySolver
+from utils import ModelDict, model_to_dict
+from variables import VariableNames, Variables
+
+
+class OptimizeResult:
+    # "sat" if the optimum was found, "unsat" if the constraints are
+    # infeasible and "unknown" if z3 gave up (e.g. timed out) first
+    satisfiable: str
+    # Value of the objective in `model`. This is the optimum if
+    # `satisfiable` is "sat" and the best value found so far otherwise
+    value: Optional[Fraction]
+    # Proven bound on the objective: no trace does better. Lower bound when
+    # minimizing, upper bound when maximizing. None if unbounded/unknown
+    bound: Optional[Fraction]
+    # Whether some trace attains `bound`. Strict constraints (e.g. `<`) can
+    # make the optimum an infimum/supremum that is only approached
+    bound_attained: bool
+    # The witness trace
+    model: Optional[ModelDict]
+    v: VariableNames
+    cfg: ModelConfig
+    timeout: float
+    solve_time: float
+
+    def __str__(self):
+        return (f"{self.satisfiable}: objective {self.value}, bound "
+                f"{self.bound}{'' if self.bound_attained else ' (strict)'}")
+
+
+def _bound_value(e: z3.ArithRef) -> Tuple[Optional[Fraction], bool]:
+    ''' Convert one of z3's optimization bounds to (value, attained). Bounds
+    may contain the symbolic constants `oo` (unbounded) and `epsilon`
+    (infinitesimal, i.e. the bound is not attained) '''
+    names = set(str(x) for x in get_vars(e))
+    if "oo" in names:
+        return (None, False)
+    attained = "epsilon" not in names
+    if not attained:
+        e = z3.substitute(e, (z3.Real("epsilon"), z3.RealVal(0)))
+    e = z3.simplify(e)
+    if not z3.is_rational_value(e):
+        return (None, False)
+    return (e.as_fraction(), attained)
+
+
+def run_optimize(c: ModelConfig, s: MySolver, v: Variables,
+                 objective: z3.ArithRef, timeout: float = 10,
+                 minimize: bool = True) -> OptimizeResult:
+    ''' Minimize (or maximize) `objective` subject to the constraints in `s`,
+    typically the output of make_solver plus any assumptions of the query.
+    `timeout` is in seconds. On timeout, returns the best trace found so far
+    and the bound z3 proved. Note, the optimizer uses its own engine, so the
+    solver chosen by c.logic/c.tactics does not apply. Unsat cores are not
+    supported: with them, `s` only holds the constraints guarded by tracking
+    literals, which the optimizer would be free to turn off '''
+    assert not c.unsat_core, "Unsat cores are not supported by run_optimize"
+    o = z3.Optimize()
+    o.set(timeout=int(timeout * 1000))
+    o.add(s.s.assertions())
+    h = o.minimize(objective) if minimize else o.maximize(objective)
+
+    start = time.time()
+    sat = str(o.check())
+    res = OptimizeResult()
+    res.solve_time = time.time() - start
+    res.satisfiable = sat if sat in ["sat", "unsat"] else "unknown"
+    res.cfg = c
+    res.timeout = timeout
+    res.v = VariableNames(v)
+
+    res.model, res.value = None, None
+    if res.satisfiable != "unsat":
+        try:
+            m = o.model()
+        except z3.Z3Exception:
+            # Gave up before finding any trace
+            m = None
+        if m is not None:
+            res.model = model_to_dict(m)
+            val = m.eval(objective, model_completion=True)
+            if z3.is_rational_value(val):
+                res.value = val.as_fraction()
+
+    res.bound, res.bound_attained = None, False
+    if res.satisfiable != "unsat":
+        res.bound, res.bound_attained = _bound_value(
+            h.lower() if minimize else h.upper())
+    return res
+
+
+if __name__ == "__main__":
+    # The lowest utilization a constant cwnd can get, in one call instead of
+    # a bisection loop
+    from model import make_solver
+    from plot import plot_model
+
+    c = ModelConfig.default()
+    c.cca = "const"
+    c.T = 10
+    s, v = make_solver(c)
+    s.add(v.alpha == c.C * c.R)
+    res = run_optimize(c, s, v, (v.S[-1] - v.S[0]) / (c.C * (c.T - 1)),
+                       timeout=60)
+    print(res)
+    if res.model is not None:
+        plot_model(res.model, c, res.v)
@@ -91,6 +91,12 @@ def plot_model(m: ModelDict, c: ModelConfig, v: VariableNames):
                     iname = f"incr_allowed_{n},{t},{dt}"
                     dname = f"decr_allowed_{n},{t},{dt}"
                     qname = f"qdel_{t},{dt}"
+                    if qname not in m:
+                        # Beyond qdel_window, only qdel_over is tracked
+                        oname = f"qdel_over_{t}"
+                        if oname in m:
+                            print(f" >{dt-1}: {int(m[oname])}", end=" ")
+                        break
                     if iname not in m:
                         print(f" - /{int(m[qname])}", end=" ")
                     else:
@@ -106,8 +112,13 @@ def plot_model(m: ModelDict, c: ModelConfig, v: VariableNames):
     if c.cca == "aimd":
         per_flow.append("last_loss")
     if c.cca == "bbr":
+        # Configs pickled before bbr_start_phases existed lack the field
+        phases = getattr(c, "bbr_start_phases", None)
         for n in range(c.N):
-            print("BBR start state = ", m[f"bbr_start_state_{n}"])
+            if phases is None:
+                print("BBR start state = ", m[f"bbr_start_state_{n}"])
+            else:
+                print("BBR start state = ", phases[n])
             per_flow.extend(["max_rate"])
 
     # def printable(names) -> str:
@@ -0,0 +1,173 @@
+''' Run one query in several processes, each with a different z3 random seed,
+tactic pipeline and arithmetic solver, and take the first definitive answer.
+Solve times of the same query can differ by orders of magnitude between
+seeds, so a portfolio is much less likely to time out than any single
+configuration. Results record which configuration won, to help tune the
+defaults '''
+
+import json
+import multiprocessing as mp
+import queue
+import time
+from typing import List, Optional, Tuple
+import z3
+
+from config import ModelConfig
+from logic import DEFAULT_TACTICS, detect_logic, make_logic_solver
+from pyz3_utils import MySolver
+from utils import ModelDict, model_to_dict
+from variables import VariableNames, Variables
+
+
+class SolverConfig:
+    # Identifies the configuration in results and logs
+    name: str
+    # Used for both the SMT core and the SAT core
+    seed: int
+    # Tactic pipeline run before the core solver (see logic.py). None for
+    # z3's default solver
+    tactics: Optional[List[str]]
+    # Value of z3's smt.arith.solver (e.g. 2 for simplex, 6 for the newer
+    # lp solver). None leaves z3's default
+    arith_solver: Optional[int]
+
+    def __init__(self, name: str, seed: int = 0,
+                 tactics: Optional[List[str]] = None,
+                 arith_solver: Optional[int] = None):
+        self.name = name
+        self.seed = seed
+        self.tactics = tactics
+        self.arith_solver = arith_solver
+
+    def __repr__(self):
+        return f"SolverConfig({self.name})"
+
+
+def default_portfolio(n: int) -> List[SolverConfig]:
+    ''' `n` configurations cycling through solver variants, each with its own
+    seed '''
+    variants: List[Tuple[str, Optional[List[str]], Optional[int]]] = [
+        ("default", None, None),
+        ("tactics", DEFAULT_TACTICS, None),
+        ("arith2", None, 2),
+        ("tactics-arith2", DEFAULT_TACTICS, 2),
+    ]
+    res = []
+    for i in range(n):
+        name, tactics, arith = variants[i % len(variants)]
+        res.append(SolverConfig(f"{name}-seed{i}", i, tactics, arith))
+    return res
+
+
+class PortfolioResult:
+    # "sat", "unsat" or "unknown" (no configuration finished in time)
+    satisfiable: str
+    model: Optional[ModelDict]
+    v: VariableNames
+    cfg: ModelConfig
+    timeout: float
+    # Wall-clock time until the first definitive answer (or giving up)
+    solve_time: float
+    # The configuration that answered. None if unknown
+    winner: Optional[SolverConfig]
+    # The configurations that finished, with their verdicts and solve times
+    # in seconds, in the order they finished
+    finished: List[Tuple[SolverConfig, str, float]]
+
+    def __str__(self):
+        winner = "none" if self.winner is None else self.winner.name
+        return (f"{self.satisfiable} in {self.solve_time:.2f}s "
+                f"(winner: {winner})")
+
+
+def _solve(smt2: str, logic: str, conf: SolverConfig, timeout: float,
+           out: "mp.Queue[Tuple[int, str, Optional[ModelDict], float]]",
+           idx: int):
+    start = time.time()
+    z3.set_param("smt.random_seed", conf.seed)
+    z3.set_param("sat.random_seed", conf.seed)
+    if conf.arith_solver is not None:
+        z3.set_param("smt.arith.solver", conf.arith_solver)
+    if conf.tactics is None:
+        s = z3.Solver()
+    else:
+        s = make_logic_solver(logic, conf.tactics)
+    s.set(timeout=int(timeout * 1000))
+    s.add(z3.parse_smt2_string(smt2))
+    sat = str(s.check())
+    if sat not in ["sat", "unsat"]:
+        sat = "unknown"
+    model = model_to_dict(s.model()) if sat == "sat" else None
+    out.put((idx, sat, model, time.time() - start))
+
+
+def run_portfolio(c: ModelConfig, s: MySolver, v: Variables,
+                  timeout: float = 10,
+                  configs: Optional[List[SolverConfig]] = None,
+                  log: Optional[str] = None) -> PortfolioResult:
+    ''' Like pyz3_utils.run_query, but solves the formula in `s` with every
+    configuration in `configs` (default: one per core) in parallel. Returns
+    the first sat/unsat answer and kills the other processes. If `log` is
+    given, appends a JSON line recording the winner and per-configuration
+    times. Unsat cores are not supported '''
+    assert not c.unsat_core, "Unsat cores are not supported by the portfolio"
+    if configs is None:
+        configs = default_portfolio(mp.cpu_count())
+    assertions = list(s.s.assertions())
+    logic = getattr(s, "logic", None)
+    if logic is None or logic == "auto":
+        logic = detect_logic(assertions)
+    # z3 terms cannot be pickled, so ship the formula as SMT-LIB
+    flat = z3.Solver()
+    flat.add(assertions)
+    smt2 = flat.sexpr()
+
+    res = PortfolioResult()
+    res.satisfiable, res.model, res.winner = "unknown", None, None
+    res.finished = []
+    res.cfg = c
+    res.timeout = timeout
+    res.v = VariableNames(v)
+
+    # spawn rather than fork, since z3's global state is not fork-safe
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_solve,
+                         args=(smt2, logic, conf, timeout, out, i))
+             for i, conf in enumerate(configs)]
+    start = time.time()
+    for p in procs:
+        p.start()
+    try:
+        while len(res.finished) < len(configs):
+            # Allow some slack over the timeout for process startup
+            left = timeout + 10 - (time.time() - start)
+            if left <= 0:
+                break
+            try:
+                idx, sat, model, dur = out.get(timeout=left)
+            except queue.Empty:
+                break
+            res.finished.append((configs[idx], sat, dur))
+            if sat in ["sat", "unsat"]:
+                res.satisfiable, res.model = sat, model
+                res.winner = configs[idx]
+                break
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        for p in procs:
+            p.join()
+    res.solve_time = time.time() - start
+
+    if log is not None:
+        with open(log, "a") as f:
+            f.write(json.dumps({
+                "satisfiable": res.satisfiable,
+                "winner": None if res.winner is None else res.winner.name,
+                "solve_time": res.solve_time,
+                "timeout": timeout,
+                "finished": [(conf.name, sat, dur)
+                             for conf, sat, dur in res.finished]}) + "\n")
+    return res
@@ -0,0 +1,203 @@
+''' Presolve that derives interval bounds for the Reals in Variables by
+propagating bounds through the unconditional linear constraints of the model.
+Cumulative quantities get bounds like 0 <= S[t] <= C*t which the solver would
+otherwise have to rediscover in every query. Since the bounds are implied by
+the model, asserting them does not change the set of traces '''
+
+from collections import deque
+from fractions import Fraction
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+import z3
+
+from config import ModelConfig
+from pyz3_utils import MySolver
+from utils import solver_assertions
+from variables import Variables
+
+# A linear constraint sum(coeffs[x] * x) + const <= 0
+Linear = Tuple[Dict[str, Fraction], Fraction]
+
+
+def to_linear(e: z3.ExprRef) -> Optional[Linear]:
+    ''' Exact linear form of an arithmetic term, or None if it is not linear
+    (e.g. contains an If) '''
+    if z3.is_rational_value(e):
+        return ({}, e.as_fraction())
+    if z3.is_int_value(e):
+        return ({}, Fraction(e.as_long()))
+    if z3.is_const(e) and z3.is_arith(e):
+        return ({str(e): Fraction(1)}, Fraction(0))
+    if z3.is_app_of(e, z3.Z3_OP_TO_REAL):
+        return to_linear(e.arg(0))
+    if z3.is_add(e) or z3.is_sub(e):
+        coeffs: Dict[str, Fraction] = {}
+        const = Fraction(0)
+        for i, x in enumerate(e.children()):
+            lin = to_linear(x)
+            if lin is None:
+                return None
+            sign = -1 if z3.is_sub(e) and i > 0 else 1
+            for k, a in lin[0].items():
+                coeffs[k] = coeffs.get(k, Fraction(0)) + sign * a
+            const += sign * lin[1]
+        return (coeffs, const)
+    if z3.is_app_of(e, z3.Z3_OP_UMINUS):
+        return _scale(to_linear(e.arg(0)), Fraction(-1))
+    if z3.is_mul(e):
+        res: Optional[Linear] = ({}, Fraction(1))
+        for x in e.children():
+            lin = to_linear(x)
+            if lin is None or res is None:
+                return None
+            if len(lin[0]) == 0:
+                res = _scale(res, lin[1])
+            elif len(res[0]) == 0:
+                res = _scale(lin, res[1])
+            else:
+                return None
+        return res
+    if z3.is_div(e):
+        den = to_linear(e.arg(1))
+        if den is None or len(den[0]) > 0 or den[1] == 0:
+            return None
+        return _scale(to_linear(e.arg(0)), 1 / den[1])
+    return None
+
+
+def _scale(lin: Optional[Linear], f: Fraction) -> Optional[Linear]:
+    if lin is None:
+        return None
+    return ({k: a * f for k, a in lin[0].items()}, lin[1] * f)
+
+
+def to_constraints(e: z3.BoolRef) -> List[Linear]:
+    ''' The unconditional linear constraints (in `Linear` form) implied by an
+    assertion. Strict inequalities are relaxed to non-strict ones '''
+    if z3.is_and(e):
+        return [x for ch in e.children() for x in to_constraints(ch)]
+    neg = False
+    if z3.is_not(e):
+        neg, e = True, e.arg(0)
+    kind = None
+    for k, pred in [("<=", z3.is_le), ("<", z3.is_lt), (">=", z3.is_ge),
+                    (">", z3.is_gt), ("==", z3.is_eq)]:
+        if pred(e):
+            kind = k
+    if kind is None or not z3.is_arith(e.arg(0)):
+        return []
+    if neg:
+        if kind == "==":
+            return []
+        kind = {"<=": ">", "<": ">=", ">=": "<", ">": "<="}[kind]
+    lhs, rhs = to_linear(e.arg(0)), to_linear(e.arg(1))
+    if lhs is None or rhs is None:
+        return []
+    # lhs - rhs
+    diff = ({k: lhs[0].get(k, Fraction(0)) - rhs[0].get(k, Fraction(0))
+             for k in set(lhs[0]) | set(rhs[0])}, lhs[1] - rhs[1])
+    diff = ({k: a for k, a in diff[0].items() if a != 0}, diff[1])
+    if kind in ["<=", "<"]:
+        return [diff]
+    if kind in [">=", ">"]:
+        return [_scale(diff, Fraction(-1))]
+    return [diff, _scale(diff, Fraction(-1))]
+
+
+class PresolveReport:
+    # Number of Reals in Variables that got a finite lower/upper bound
+    lower: int
+    upper: int
+    # Number of those bounds that were not already asserted as a simple bound
+    tightened: int
+    # Number of linear constraints used for propagation
+    constraints: int
+    # Number of propagation steps performed
+    steps: int
+
+    def __init__(self):
+        self.lower, self.upper, self.tightened = 0, 0, 0
+        self.constraints, self.steps = 0, 0
+
+    def __str__(self):
+        return (f"presolve: {self.lower} lower and {self.upper} upper bounds "
+                f"({self.tightened} new) from {self.constraints} constraints "
+                f"in {self.steps} steps")
+
+
+def _var_names(x: Any) -> List[str]:
+    if type(x) == list:
+        return [n for y in x for n in _var_names(y)]
+    if isinstance(x, z3.ArithRef) and z3.is_const(x) and z3.is_real(x):
+        return [str(x)]
+    return []
+
+
+def propagate_bounds(c: ModelConfig, s: MySolver, v: Variables,
+                     max_steps: Optional[int] = None) -> PresolveReport:
+    ''' Derive bounds for the Reals in `v` from the constraints asserted in `s`
+    so far and assert them. `max_steps` caps the number of constraint
+    revisits (default: 20 per constraint) '''
+    cons = [x for e in solver_assertions(s) for x in to_constraints(e)]
+    report = PresolveReport()
+    report.constraints = len(cons)
+    if max_steps is None:
+        max_steps = 20 * len(cons)
+
+    lo: Dict[str, Fraction] = {}
+    hi: Dict[str, Fraction] = {}
+    # Bounds that are already asserted as a single-variable constraint
+    known: Set[Tuple[str, str]] = set()
+    occurs: Dict[str, List[int]] = {}
+    for i, (coeffs, _) in enumerate(cons):
+        for k in coeffs:
+            occurs.setdefault(k, []).append(i)
+        if len(coeffs) == 1:
+            k, a = next(iter(coeffs.items()))
+            known.add((k, "hi" if a > 0 else "lo"))
+
+    queue: Deque[int] = deque(range(len(cons)))
+    queued = set(queue)
+    while len(queue) > 0 and report.steps < max_steps:
+        i = queue.popleft()
+        queued.remove(i)
+        report.steps += 1
+        coeffs, const = cons[i]
+        # Minimum of each term a*x. None if unbounded
+        mins: Dict[str, Optional[Fraction]] = {}
+        for k, a in coeffs.items():
+            b = lo.get(k) if a > 0 else hi.get(k)
+            mins[k] = None if b is None else a * b
+        unbounded = [k for k in coeffs if mins[k] is None]
+        if len(unbounded) > 1:
+            continue
+        total = const + sum(m for m in mins.values() if m is not None)
+        for k, a in coeffs.items():
+            if len(unbounded) == 1 and k != unbounded[0]:
+                continue
+            rest = total - (mins[k] if mins[k] is not None else 0)
+            # a * x <= -rest
+            bound = -rest / a
+            changed = False
+            if a > 0 and (k not in hi or bound < hi[k]):
+                hi[k] = bound
+                changed = True
+            if a < 0 and (k not in lo or bound > lo[k]):
+                lo[k] = bound
+                changed = True
+            if changed:
+                for j in occurs[k]:
+                    if j != i and j not in queued:
+                        queue.append(j)
+                        queued.add(j)
+
+    for name in set(_var_names(list(v.__dict__.values()))):
+        x = z3.Real(name)
+        if name in lo:
+            s.add(x >= lo[name])
+            report.lower += 1
+            report.tightened += int((name, "lo") not in known)
+        if name in hi:
+            s.add(x <= hi[name])
+            report.upper += 1
+            report.tightened += int((name, "hi") not in known)
+    return report
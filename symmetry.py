@@ -0,0 +1,149 @@
+''' Symmetry breaking for multi-flow models. When all flows are
+interchangeable, every trace has N! relabellings which the solver would
+otherwise explore separately '''
+
+import re
+from fractions import Fraction
+from typing import Any, Dict, List, Optional, Set, Tuple
+import z3
+
+from config import ModelConfig
+from presolve import to_linear
+from pyz3_utils import MySolver
+from utils import solver_assertions
+from variables import Variables
+
+# Per-flow variables are named "<prefix>_<flow>" or "<prefix>_<flow>,<...>"
+_FLOW_NAME = re.compile(r"^(.*)_(\d+)((?:,\d+)*)$")
+
+
+def _names(x: Any) -> Set[str]:
+    if type(x) == list:
+        return set().union(*[_names(y) for y in x])
+    if isinstance(x, z3.ExprRef) and z3.is_const(x):
+        return {str(x)}
+    return set()
+
+
+_COMMUTATIVE = [z3.Z3_OP_ADD, z3.Z3_OP_MUL, z3.Z3_OP_AND, z3.Z3_OP_OR,
+                z3.Z3_OP_EQ, z3.Z3_OP_DISTINCT, z3.Z3_OP_IFF]
+# Comparisons in the form that `lhs - rhs <op> 0` is normalized to. Flipped
+# comparisons are negated first
+_CMP = {z3.Z3_OP_LE: ("le", 1), z3.Z3_OP_LT: ("lt", 1),
+        z3.Z3_OP_GE: ("le", -1), z3.Z3_OP_GT: ("lt", -1),
+        z3.Z3_OP_EQ: ("eq", 1)}
+
+
+def _canonical(e: z3.ExprRef,
+               memo: Dict[int, Tuple[z3.ExprRef, str]]) -> str:
+    ''' A string that is equal for formulas that only differ in the order
+    of operands of commutative operators or in how a linear (in)equality is
+    arranged (e.g. `tot == a + b` and `b + a - tot == 0`) '''
+    if e.get_id() in memo:
+        return memo[e.get_id()][1]
+    kind = e.decl().kind() if z3.is_app(e) else None
+    res = None
+    if kind in _CMP and z3.is_arith(e.arg(0)):
+        lin = to_linear(e.arg(0) - e.arg(1))
+        if lin is not None:
+            op, sign = _CMP[kind]
+            coeffs = sorted((k, a) for k, a in lin[0].items() if a != 0)
+            # Scale so the leading coefficient is 1 (or -1 for inequalities,
+            # which may only be scaled by positive factors)
+            scale = Fraction(1)
+            if len(coeffs) > 0:
+                scale = 1 / abs(coeffs[0][1]) if op != "eq" \
+                    else 1 / coeffs[0][1]
+            scale *= sign if op != "eq" else 1
+            res = op + repr(([(k, a * scale) for k, a in coeffs],
+                             lin[1] * scale))
+    if res is None:
+        if z3.is_app(e) and e.num_args() > 0:
+            args = [_canonical(x, memo) for x in e.children()]
+            if kind in _COMMUTATIVE:
+                args.sort()
+            res = f"({e.decl().name()} {' '.join(args)})"
+        else:
+            res = e.sexpr()
+    # Keep e alive, so its id is not reused by another term
+    memo[e.get_id()] = (e, res)
+    return res
+
+
+def _constants(assertions: List[z3.BoolRef]) -> Dict[str, z3.ExprRef]:
+    ''' The uninterpreted constants in `assertions` by name. Unlike
+    z3util.get_vars, this visits shared subterms once '''
+    res: Dict[str, z3.ExprRef] = {}
+    visited = set()
+    stack: List[z3.ExprRef] = list(assertions)
+    while len(stack) > 0:
+        e = stack.pop()
+        if e.get_id() in visited:
+            continue
+        visited.add(e.get_id())
+        if z3.is_const(e) and e.decl().kind() == z3.Z3_OP_UNINTERPRETED:
+            res[e.decl().name()] = e
+        stack.extend(e.children())
+    return res
+
+
+def _swap(decls: Dict[str, z3.ExprRef], glob: Set[str], n1: int,
+          n2: int) -> Optional[List[Tuple[z3.ExprRef, z3.ExprRef]]]:
+    ''' Substitution that exchanges the variables of flows n1 and n2. None if
+    some variable has no counterpart in the other flow '''
+    res = []
+    for name, x in decls.items():
+        m = _FLOW_NAME.match(name)
+        if name in glob or m is None or int(m.group(2)) not in [n1, n2]:
+            continue
+        other = n2 if int(m.group(2)) == n1 else n1
+        oname = f"{m.group(1)}_{other}{m.group(3)}"
+        if oname not in decls:
+            return None
+        res.append((x, decls[oname]))
+    return res
+
+
+def flows_interchangeable(c: ModelConfig, s: MySolver, v: Variables) -> bool:
+    ''' Whether exchanging any two adjacent flows maps the set of assertions
+    in s onto itself. Since adjacent transpositions generate all
+    permutations, the flows are then fully interchangeable. Assertions are
+    compared in a canonical form (see `_canonical`) so that e.g. the order of
+    terms in Sum(A_f) does not matter '''
+    assertions = solver_assertions(s)
+    glob: Set[str] = set()
+    for k, x in v.__dict__.items():
+        if not k.endswith("_f"):
+            glob |= _names(x)
+    decls = _constants(assertions)
+
+    memo: Dict[int, Tuple[z3.ExprRef, str]] = {}
+    normal = {_canonical(e, memo) for e in assertions}
+    for n in range(c.N - 1):
+        swap = _swap(decls, glob, n, n + 1)
+        if swap is None:
+            return False
+        # One substitution over all assertions is much faster than one each
+        swapped = z3.substitute(z3.And(*assertions), *swap)
+        for e in swapped.children():
+            if _canonical(e, memo) not in normal:
+                return False
+    return True
+
+
+def break_symmetry(c: ModelConfig, s: MySolver, v: Variables,
+                   check: bool = True) -> bool:
+    ''' Order the flows lexicographically by (initial cwnd, initial arrival).
+    Call this after all query constraints have been added. The constraints
+    are only added if the formula is symmetric in the flows (unless `check`
+    is False). Returns whether they were added '''
+    if c.N < 2:
+        return False
+    if check and not flows_interchangeable(c, s, v):
+        return False
+    for n in range(c.N - 1):
+        s.add(z3.Or(
+            v.c_f[n][0] < v.c_f[n + 1][0],
+            z3.And(v.c_f[n][0] == v.c_f[n + 1][0],
+                   v.A_f[n][0] <= v.A_f[n + 1][0])))
+    return True
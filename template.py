@@ -0,0 +1,94 @@
+''' Cache of the CCA-independent part of the model. Many queries share the same
+network configuration and differ only in the CCA and the property, so we build
+the network constraints once per configuration and hand out cheap copies '''
+
+from typing import Dict, List, Optional, Set, Tuple
+import z3
+
+from config import ModelConfig
+from logic import specialise_solver
+from model import make_cca, make_network
+from presolve import propagate_bounds
+from pyz3_utils import MySolver
+from utils import RecordingSolver
+from variables import Variables
+
+# Config parameters that influence Variables or make_network
+_NETWORK_PARAMS = ["N", "D", "R", "T", "C", "buf_min", "buf_max", "dupacks",
+                   "compose", "alpha", "epsilon", "enhancement",
+                   "calculate_qdel", "loss_window", "qdel_window",
+                   "alias_aggregates", "arrival_selectors"]
+
+
+class NetworkTemplate:
+    def __init__(self, c: ModelConfig):
+        r = RecordingSolver()
+        v = Variables(c, r)
+        make_network(c, r, v)
+        self.constraints: List[z3.BoolRef] = r.recorded
+        self.variables: Set[str] = r.variables
+
+    def translate(self, ctx: z3.Context) -> List[z3.BoolRef]:
+        ''' The constraints in another z3 context (e.g. for use in another
+        thread) '''
+        return [e.translate(ctx) for e in self.constraints]
+
+    def to_smt2(self) -> str:
+        ''' Serialized form that can be loaded with z3.parse_smt2_string, e.g.
+        in another process '''
+        s = z3.Solver()
+        s.add(*self.constraints)
+        return s.to_smt2()
+
+
+_templates: Dict[Tuple, NetworkTemplate] = {}
+
+
+def network_key(c: ModelConfig) -> Tuple:
+    key = []
+    for p in _NETWORK_PARAMS:
+        x = getattr(c, p)
+        # z3 expressions are not safe to compare with ==
+        key.append(str(x) if isinstance(x, z3.ExprRef) else x)
+    return tuple(key)
+
+
+def get_template(c: ModelConfig) -> NetworkTemplate:
+    key = network_key(c)
+    if key not in _templates:
+        _templates[key] = NetworkTemplate(c)
+    return _templates[key]
+
+
+def clear_templates():
+    _templates.clear()
+
+
+def make_solver_cached(c: ModelConfig,
+                       s: Optional[MySolver] = None
+                       ) -> Tuple[MySolver, Variables]:
+    ''' Same as model.make_solver, but reuses the network constraints from the
+    template cache. Only the CCA constraints are built afresh '''
+    tmpl = get_template(c)
+    if s is None:
+        s = MySolver()
+    if c.unsat_core:
+        # Every constraint must go through MySolver.add to be tracked
+        s.set(unsat_core=True)
+        for e in tmpl.constraints:
+            s.add(e)
+    else:
+        s.s.add(*tmpl.constraints)
+    s.variables |= tmpl.variables
+
+    # The constraints Variables adds are already part of the template
+    r = RecordingSolver()
+    v = Variables(c, r)
+    s.variables |= r.variables
+
+    make_cca(c, s, v)
+    if c.presolve:
+        s.presolve_report = propagate_bounds(c, s, v)
+    if c.logic is not None and not c.unsat_core:
+        specialise_solver(s, c.logic, c.tactics)
+    return (s, v)
@@ -0,0 +1,60 @@
+import unittest
+from fractions import Fraction
+from z3 import Real
+
+from bbr_split import run_phase_split
+from cca_registry import freedom_duration
+from config import ModelConfig
+from model import make_solver
+from pyz3_utils import run_query
+from utils import make_periodic
+
+
+def low_util(c: ModelConfig):
+    s, v = make_solver(c)
+    s.add(v.L[0] == 0)
+    s.add(v.S[-1] - v.S[0] < Fraction(1, 10) * c.C * (c.T - 1))
+    make_periodic(c, s, v, freedom_duration(c))
+    return s, v
+
+
+def skip_phase(c: ModelConfig):
+    # Probing with gain 5/4 at t=4 must be followed by draining at t=5, so
+    # this is unsat whatever the start phase
+    s, v = make_solver(c)
+    max_rate = [Real(f"max_rate_0,{t}") for t in range(c.T)]
+    s.add(max_rate[4] > 0)
+    s.add(v.r_f[0][4] == Fraction(5, 4) * max_rate[4])
+    s.add(v.r_f[0][5] != Fraction(4, 5) * max_rate[5])
+    return s, v
+
+
+class TestBBRSplit(unittest.TestCase):
+    def config(self) -> ModelConfig:
+        c = ModelConfig.default()
+        c.cca = "bbr"
+        c.T = 8
+        c.enhancement = False
+        return c
+
+    def test_agrees_with_unsplit(self):
+        for build, expected in [(low_util, "sat"), (skip_phase, "unsat")]:
+            c = self.config()
+            s, v = build(c)
+            self.assertEqual(str(run_query(c, s, v, 60).satisfiable),
+                             expected)
+            res = run_phase_split(c, build, 60, processes=2)
+            self.assertEqual(res.satisfiable, expected)
+            if expected == "sat":
+                assert res.cfg is not None and res.qres is not None
+                self.assertEqual(res.cfg.bbr_start_phases,
+                                 list(res.phases))
+                self.assertIsNone(c.bbr_start_phases)
+                self.assertNotIn("bbr_start_state_0", res.qres.model)
+            else:
+                # Every phase was refuted
+                self.assertEqual(len(res.results), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from fractions import Fraction
+
+from bound_search import find_bound
+from config import ModelConfig
+from test_helpers import low_util
+
+
+def util(c: ModelConfig, v):
+    return (v.S[-1] - v.S[0]) / (c.C * (c.T - 1))
+
+
+class TestBoundSearch(unittest.TestCase):
+    def test_find_bound(self):
+        c = ModelConfig.default()
+        c.cca = "const"
+        c.T = 5
+        res = find_bound(low_util, c, 0, 2, 0.05, k=3, processes=2,
+                         cache_dir=None)
+        self.assertFalse(res.inconsistent)
+        self.assertLessEqual(res.hi - res.lo, 0.05)
+        # Every probe agrees with the bounds, which stay exact
+        self.assertIsInstance(res.lo, Fraction)
+        self.assertIsInstance(res.hi, Fraction)
+        for p in res.probes:
+            self.assertIsInstance(p.thresh, Fraction)
+            if p.satisfiable == "sat":
+                self.assertGreaterEqual(p.thresh, res.hi)
+            if p.satisfiable == "unsat":
+                self.assertLessEqual(p.thresh, res.lo)
+        # Narrowing 4-fold per round takes 3 rounds to go from 2 to 0.05
+        self.assertEqual(max(p.round for p in res.probes), 2)
+
+    def test_find_bound_metric(self):
+        c = ModelConfig.default()
+        c.cca = "const"
+        c.T = 5
+        res = find_bound(low_util, c, 0, 2, 0.05, k=3, processes=2,
+                         cache_dir=None, metric=util)
+        plain = find_bound(low_util, c, 0, 2, 0.05, k=3, processes=2,
+                           cache_dir=None)
+        self.assertFalse(res.inconsistent)
+        self.assertLessEqual(res.hi - res.lo, 0.05)
+        for p in res.probes:
+            if p.satisfiable == "sat":
+                # The witness beats the threshold and bounds the search
+                self.assertIsNotNone(p.metric)
+                self.assertLess(p.metric, p.thresh)
+                self.assertGreaterEqual(p.metric, res.hi)
+        # Jumping to the witnessed utilization never needs more calls
+        self.assertLessEqual(len(res.probes), len(plain.probes))
+
+
+if __name__ == '__main__':
+    unittest.main()
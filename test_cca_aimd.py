@@ -1,5 +1,5 @@
 import unittest
-from z3 import And, Not, Or
+from z3 import And, Implies, Not, Or
 
 from model import Variables, cwnd_rate_arrival, epsilon_alpha,\
     initial, loss_detected, monotone, network, relate_tot
@@ -46,6 +46,85 @@ class TestCCAAimd(unittest.TestCase):
         sat = s.check()
         self.assertEqual(str(sat), "unsat")
 
+    def test_can_incr_chained(self):
+        c = ModelConfig.default()
+        c.aimd_incr_irrespective = False
+        s = MySolver()
+        v = Variables(c, s)
+        monotone(c, s, v)
+        initial(c, s, v)
+        relate_tot(c, s, v)
+        network(c, s, v)
+        loss_detected(c, s, v)
+        epsilon_alpha(c, s, v)
+        cwnd_rate_arrival(c, s, v)
+
+        c.aimd_incr_chained = True
+        cv = AIMDVariables(c, s)
+        can_incr(c, s, v, cv)
+
+        # The original encoding, on separate incr variables
+        c.aimd_incr_chained = False
+        ref = AIMDVariables(c, MySolver())
+        ref.incr_f = [[s.Bool(f"ref_incr_{n},{t}") for t in range(c.T)]
+                      for n in range(c.N)]
+        can_incr(c, s, v, ref)
+
+        # Both encodings agree on every trace
+        s.add(Or(*[cv.incr_f[n][t] != ref.incr_f[n][t]
+                   for n in range(c.N) for t in range(1, c.T)]))
+        self.assertEqual(str(s.check()), "unsat")
+
+    def test_last_loss_terms(self):
+        c = ModelConfig.default()
+        c.aimd_incr_irrespective = False
+        s = MySolver()
+        v = Variables(c, s)
+        monotone(c, s, v)
+        initial(c, s, v)
+        relate_tot(c, s, v)
+        network(c, s, v)
+        loss_detected(c, s, v)
+        epsilon_alpha(c, s, v)
+        cwnd_rate_arrival(c, s, v)
+        cv = cca_aimd(c, s, v)
+
+        # The original encoding, with a last_loss Real per timestep, computes
+        # the cwnd into separate variables from the same network trace
+        ll = [[s.Real(f"ref_last_loss_{n},{t}") for t in range(c.T)]
+              for n in range(c.N)]
+        cwnd = [[s.Real(f"ref_cwnd_{n},{t}") for t in range(c.T)]
+                for n in range(c.N)]
+        for n in range(c.N):
+            s.add(ll[n][0] == v.S_f[n][0])
+            s.add(cwnd[n][0] == v.c_f[n][0])
+            for t in range(1, c.T):
+                timeout = v.timeout_f[n][t]
+                if t > c.R+1:
+                    decrease = And(v.Ld_f[n][t] > v.Ld_f[n][t-1],
+                                   ll[n][t-1] <= v.S_f[n][t-c.R-1])
+                else:
+                    decrease = v.Ld_f[n][t] > v.Ld_f[n][t-1]
+                new_ll = v.A_f[n][t] - v.L_f[n][t] + v.dupacks
+                s.add(Implies(And(decrease, Not(timeout)),
+                              And(ll[n][t] == new_ll,
+                                  cwnd[n][t] == cwnd[n][t-1] / 2)))
+                s.add(Implies(And(Not(decrease), Not(timeout)),
+                              ll[n][t] == ll[n][t-1]))
+                s.add(Implies(And(Not(decrease), Not(timeout),
+                                  cv.incr_f[n][t-1]),
+                              cwnd[n][t] == cwnd[n][t-1] + v.alpha))
+                s.add(Implies(And(Not(decrease), Not(timeout),
+                                  Not(cv.incr_f[n][t-1])),
+                              cwnd[n][t] == cwnd[n][t-1]))
+                s.add(Implies(timeout, And(cwnd[n][t] == v.alpha,
+                                           ll[n][t] == new_ll)))
+
+        # Both encodings agree on every trace
+        s.add(Or(*[cwnd[n][t] != v.c_f[n][t]
+                   for n in range(c.N) for t in range(c.T)]))
+        self.assertEqual(str(s.check()), "unsat")
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+from z3 import If, Or, Real
+
+from cca_bbr import bbr_params
+from config import ModelConfig
+from model import make_solver
+
+
+class TestCCABBR(unittest.TestCase):
+    def test_sliding_max_rate(self):
+        for enhancement in [False, True]:
+            c = ModelConfig.default()
+            c.cca = "bbr"
+            c.T = 12
+            c.enhancement = enhancement
+            s, v = make_solver(c)
+            P = c.R
+            max_R, _ = bbr_params(c)
+
+            # The original encoding: a chain of Ifs over the whole window
+            conds = []
+            for n in range(c.N):
+                for t in range(c.R + P, c.T):
+                    hi = t - c.R
+                    lo = max(P, hi - max_R + 1)
+                    ref = (v.S_f[n][lo] - v.S_f[n][lo-P]) / P
+                    for u in range(lo + 1, hi + 1):
+                        rate = (v.S_f[n][u] - v.S_f[n][u-P]) / P
+                        ref = If(rate > ref, rate, ref)
+                    conds.append(Real(f"max_rate_{n},{t}") != ref)
+
+            # Both encodings agree on every trace
+            s.add(Or(*conds))
+            self.assertEqual(str(s.check()), "unsat")
+
+
+if __name__ == '__main__':
+    unittest.main()
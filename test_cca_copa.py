@@ -0,0 +1,74 @@
+import unittest
+from z3 import And, Not, is_eq
+
+from cca_copa import CopaObservations, cca_copa
+from config import ModelConfig
+from model import Variables, make_network, make_solver
+from pyz3_utils import MySolver
+from utils import RecordingSolver
+
+
+class TestCCACopa(unittest.TestCase):
+    def test_debug_equivalent(self):
+        for D in [1, 2]:
+            c = ModelConfig.default()
+            c.cca = "copa"
+            c.D = D
+            s = MySolver()
+            v = Variables(c, s)
+            make_network(c, s, v)
+
+            # The compact encoding and the one with a named Bool per dt, on
+            # the same incr/decr variables
+            compact = RecordingSolver()
+            cca_copa(c, compact, v)
+            c.copa_debug = True
+            debug = RecordingSolver()
+            cca_copa(c, debug, v)
+            defs = [e for e in debug.recorded if is_eq(e) and str(
+                e.arg(0)).startswith(("incr_allowed_", "decr_allowed_"))]
+            self.assertGreater(len(defs), 0)
+
+            # Every trace of the debug encoding satisfies the compact one
+            s.add(And(*debug.recorded))
+            s.add(Not(And(*compact.recorded)))
+            self.assertEqual(str(s.check()), "unsat")
+
+            # And every trace of the compact encoding satisfies the debug
+            # one, once its Bools are defined
+            s = MySolver()
+            make_network(c, s, v)
+            s.add(And(*compact.recorded))
+            s.add(And(*defs))
+            s.add(Not(And(*debug.recorded)))
+            self.assertEqual(str(s.check()), "unsat")
+
+    def test_jitter(self):
+        # With D == 1 decisions act on qdel itself, as before D > 1 was
+        # supported, so no windowed observations are added
+        c = ModelConfig.default()
+        c.cca = "copa"
+        s = MySolver()
+        v = Variables(c, s)
+        obs = CopaObservations(c, s, v)
+        for e in range(c.T):
+            self.assertIs(obs.get_qdel(e), v.qdel[e])
+        r = RecordingSolver()
+        cca_copa(c, r, v)
+        self.assertFalse(any(x.startswith("copa_qdel")
+                             for x in r.variables))
+
+        for D in [2, 4]:
+            c.D = D
+            c.T = 8 + D
+            s, v = make_solver(c)
+            # One windowed observation per delay and window end
+            seen = [x for x in s.variables if x.startswith("copa_qdel_seen_")]
+            self.assertGreater(len(seen), 0)
+            self.assertLessEqual(len(seen), c.T * c.qdel_window_len())
+            s.add(v.S[-1] - v.S[0] < 0.5 * c.C * (c.T - 1))
+            self.assertEqual(str(s.check()), "sat")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,15 @@
+''' Query builders shared by the tests '''
+
+from fractions import Fraction
+
+from config import ModelConfig
+from model import make_solver
+
+
+def low_util(c: ModelConfig, thresh: Fraction):
+    ''' Utilization below `thresh` with alpha = one BDP. This is module level,
+    so it can be sent to worker processes '''
+    s, v = make_solver(c)
+    s.add(v.alpha == c.C * c.R)
+    s.add(v.S[-1] - v.S[0] < thresh * c.C * (c.T - 1))
+    return s, v
@@ -0,0 +1,42 @@
+import unittest
+from z3 import Int, Real
+
+from config import ModelConfig
+from logic import detect_logic, join_logics
+from model import make_solver
+
+
+class TestLogic(unittest.TestCase):
+    def test_detect_logic(self):
+        x, y, i = Real("x"), Real("y"), Int("i")
+        self.assertEqual(detect_logic([x + 2 * y <= 1]), "QF_LRA")
+        self.assertEqual(detect_logic([x * y <= 1]), "QF_NRA")
+        self.assertEqual(detect_logic([x <= i]), "QF_LIRA")
+        self.assertEqual(join_logics("QF_LRA", "QF_LIA"), "QF_LIRA")
+        self.assertEqual(join_logics("QF_NRA", "QF_LIRA"), "QF_NIRA")
+        self.assertEqual(join_logics("QF_LRA", "QF_LRA"), "QF_LRA")
+
+    def test_auto_includes_property(self):
+        c = ModelConfig.default()
+        c.cca = "aimd"
+        c.logic = "auto"
+        s, v = make_solver(c)
+        self.assertEqual(str(s.check()), "sat")
+        self.assertEqual(s.logic, "QF_LRA")
+
+        # A property outside the network's fragment, added after make_solver
+        s.add(v.alpha * v.alpha == 2)
+        self.assertEqual(str(s.check()), "sat")
+        self.assertEqual(s.logic, "QF_NRA")
+
+        # Same answers as the generic solver
+        s.add(v.alpha > 2)
+        c.logic = None
+        s2, v2 = make_solver(c)
+        s2.add(v2.alpha * v2.alpha == 2)
+        s2.add(v2.alpha > 2)
+        self.assertEqual(str(s2.check()), "unsat")
+        self.assertEqual(str(s.check()), "unsat")
+
+if __name__ == '__main__':
+    unittest.main()
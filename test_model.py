@@ -1,10 +1,14 @@
+import contextlib
+import io
 import unittest
-from z3 import And, Implies, Or
+from z3 import And, If, Implies, Not, Or
 
+from cca_registry import freedom_duration, registered_ccas
 from config import ModelConfig
-from model import Variables, calculate_qdel, initial, monotone, make_solver, \
-    network, relate_tot
+from model import Variables, calculate_qdel, initial, loss_detected, \
+    monotone, make_solver, make_variant_solver, network, relate_tot
 from pyz3_utils import MySolver
+from symmetry import break_symmetry, flows_interchangeable
 
 
 class TestModel(unittest.TestCase):
@@ -79,7 +83,7 @@ class TestModel(unittest.TestCase):
 
     def test_qdel(self):
         c = ModelConfig.default()
-        c.calculate_qdel = True
+        c.cca = "copa"
         s = MySolver()
         v = Variables(c, s)
 
@@ -106,6 +110,221 @@ class TestModel(unittest.TestCase):
 
         self.assertEqual(str(sat), "unsat")
 
+    def test_qdel_window(self):
+        c = ModelConfig.default()
+        c.cca = "copa"
+        c.qdel_window = 3
+        s = MySolver()
+        v = Variables(c, s)
+
+        monotone(c, s, v)
+        initial(c, s, v)
+        relate_tot(c, s, v)
+        network(c, s, v)
+        calculate_qdel(c, s, v)
+
+        # The overflow bucket is mutually exclusive with the tracked delays
+        conds = []
+        for t in range(c.T):
+            qdels = v.qdel[t] + [v.qdel_over[t]]
+            for i in range(len(qdels)):
+                for j in range(i + 1, len(qdels)):
+                    conds.append(And(qdels[i], qdels[j]))
+        s.add(Or(*conds))
+        sat = s.check()
+
+        self.assertEqual(str(sat), "unsat")
+
+    def test_copa_qdel_window_default_exact(self):
+        # By default every delay is tracked exactly, so Copa never falls back
+        # to the approximate overflow case
+        c = ModelConfig.default()
+        c.cca = "copa"
+        self.assertEqual(c.qdel_window_len(), c.T)
+        s, v = make_solver(c)
+        self.assertFalse(any("qdel_over" in x for x in s.variables))
+        c.qdel_window = c.T
+        s2, _ = make_solver(c)
+        self.assertEqual({e.sexpr() for e in s.s.assertions()},
+                         {e.sexpr() for e in s2.s.assertions()})
+
+        # With a smaller window, the overflow case is used
+        c.qdel_window = 3
+        s, v = make_solver(c)
+        self.assertTrue(any("qdel_over" in x for x in s.variables))
+
+    def test_loss_window(self):
+        # Losses older than the window that are detectable must still be
+        # detected, even though their constraints were not generated
+        c = ModelConfig.default()
+        c.buf_min = 1
+        c.buf_max = 1
+        c.loss_window = 2
+        s = MySolver()
+        v = Variables(c, s)
+        monotone(c, s, v)
+        initial(c, s, v)
+        relate_tot(c, s, v)
+        network(c, s, v)
+        loss_detected(c, s, v)
+
+        conds = []
+        for t in range(c.T):
+            for dt in range(c.loss_window_len() + 1, c.T):
+                if t - c.R - dt < 0:
+                    continue
+                conds.append(And(
+                    Not(v.timeout_f[0][t]),
+                    v.A_f[0][t-c.R-dt] - v.L_f[0][t-c.R-dt] + v.dupacks
+                    <= v.S_f[0][t-c.R],
+                    v.Ld_f[0][t] < v.L_f[0][t-c.R-dt]))
+        s.add(Or(*conds))
+        sat = s.check()
+        self.assertEqual(str(sat), "unsat")
+
+    def test_variant_solver(self):
+        # W[0] >= 0 is only part of the enhanced model
+        c = ModelConfig.default()
+        s, v, lits = make_variant_solver(c, {
+            "original": {"enhancement": False},
+            "enhanced": {"enhancement": True}})
+        s.add(v.W[0] < 0)
+        self.assertEqual(str(s.s.check(lits["original"])), "sat")
+        self.assertEqual(str(s.s.check(lits["enhanced"])), "unsat")
+
+    def test_symmetry(self):
+        c = ModelConfig.default()
+        c.N = 2
+        c.cca = "aimd"
+        s, v = make_solver(c)
+        self.assertTrue(flows_interchangeable(c, s, v))
+        num = len(s.s.assertions())
+        self.assertTrue(break_symmetry(c, s, v))
+        self.assertEqual(len(s.s.assertions()), num + c.N - 1)
+
+        # Treating one flow differently breaks the symmetry
+        s, v = make_solver(c)
+        s.add(v.S_f[0][-1] > v.S_f[1][-1])
+        self.assertFalse(break_symmetry(c, s, v))
+
+        # Even when the query contradicts the ordering
+        s, v = make_solver(c)
+        s.add(v.c_f[0][0] > v.c_f[1][0])
+        self.assertFalse(break_symmetry(c, s, v))
+        self.assertEqual(str(s.check()), "sat")
+
+    def test_alias_aggregates(self):
+        c = ModelConfig.default()
+        c.cca = "aimd"
+        c.alias_aggregates = True
+        s, v = make_solver(c)
+        self.assertFalse(any(x.startswith("tot_") for x in s.variables))
+        self.assertTrue(v.S[-1].eq(v.S_f[0][-1]))
+
+        # Same answer as with separate aggregate variables
+        s.add(v.S[-1] - v.S[0] < 0.1 * c.C * c.T)
+        c.alias_aggregates = False
+        s2, v2 = make_solver(c)
+        s2.add(v2.S[-1] - v2.S[0] < 0.1 * c.C * c.T)
+        self.assertEqual(str(s.check()), str(s2.check()))
+
+    def test_qdel_window_superset(self):
+        # Every trace of the exact model is also a trace of the approximate
+        # one: fixing the shared variables to an exact model stays sat. The
+        # exact traces have a delay >= the window, so the overflow is used
+        Q = 2
+        for cca, N in [("copa", 1), ("aimd", 2)]:
+            c = ModelConfig.default()
+            c.cca = cca
+            c.N = N
+            c.T = 8
+            for thresh in [0.5, 0.9]:
+                c.qdel_window = None
+                s, v = make_solver(c)
+                s.add(v.S[-1] - v.S[0] < thresh * c.C * (c.T - 1))
+                s.add(Or(*[v.qdel[t][dt] for t in range(c.T)
+                           for dt in range(Q, t + 1)]))
+                self.assertEqual(str(s.check()), "sat")
+                m = s.s.model()
+
+                c.qdel_window = Q
+                s2, v2 = make_solver(c)
+                s2.add(v2.S[-1] - v2.S[0] < thresh * c.C * (c.T - 1))
+                for d in m.decls():
+                    if d.name() in s2.variables:
+                        s2.add(d() == m[d])
+                self.assertEqual(str(s2.check()), "sat")
+
+    def test_cca_registry(self):
+        c = ModelConfig.default()
+        self.assertFalse(c.calculate_qdel)
+        self.assertEqual(freedom_duration(c), 0)
+        c.cca = "copa"
+        self.assertTrue(c.qdel_needed())
+        # calculate_qdel follows the CCA chosen after construction
+        self.assertTrue(c.calculate_qdel)
+        _, v = make_solver(c)
+        self.assertTrue(hasattr(v, "qdel"))
+        self.assertEqual(freedom_duration(c), c.R + c.D)
+        c.cca = "aimd"
+        self.assertFalse(c.qdel_needed())
+        c.N = 2
+        self.assertTrue(c.qdel_needed())
+        c.cca = "unknown"
+        self.assertRaises(ValueError, c.qdel_needed)
+
+        # The command line only offers registered CCAs
+        parser = ModelConfig.get_argparse()
+        for cca in registered_ccas():
+            self.assertEqual(parser.parse_args(["--cca", cca]).cca, cca)
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertRaises(SystemExit, parser.parse_args,
+                              ["--cca", "fixed_d"])
+
+    def test_arrival_selectors(self):
+        c = ModelConfig.default()
+        c.cca = "aimd"
+        c.N = 2
+
+        def arrival(v, n, t):
+            # A_w and A_r as in cwnd_rate_arrival
+            A_w = v.S_f[n][t - c.R] + v.Ld_f[n][t] + v.c_f[n][t]
+            A_w = If(A_w >= v.A_f[n][t - 1], A_w, v.A_f[n][t - 1])
+            A_r = v.A_f[n][t - 1] + v.r_f[n][t]
+            return A_w, A_r
+
+        # The selector encoding forces the If-term arrival
+        c.arrival_selectors = True
+        s, v = make_solver(c)
+        conds = []
+        for n in range(c.N):
+            for t in range(c.R, c.T):
+                A_w, A_r = arrival(v, n, t)
+                conds.append(v.A_f[n][t] != If(A_w >= A_r, A_r, A_w))
+        s.add(Or(*conds))
+        self.assertEqual(str(s.check()), "unsat")
+
+        # And the If terms satisfy the selector constraints
+        c.arrival_selectors = False
+        s, v = make_solver(c)
+        conds = []
+        for n in range(c.N):
+            for t in range(c.R, c.T):
+                A_w, A_r = arrival(v, n, t)
+                conds.append(Not(And(
+                    v.A_f[n][t] <= A_w, v.A_f[n][t] <= A_r,
+                    Or(v.A_f[n][t] == A_w, v.A_f[n][t] == A_r))))
+        s.add(Or(*conds))
+        self.assertEqual(str(s.check()), "unsat")
+
+        for thresh in [0.1, 0.9]:
+            res = []
+            for selectors in [False, True]:
+                c.arrival_selectors = selectors
+                s, v = make_solver(c)
+                s.add(v.S[-1] - v.S[0] < thresh * c.C * (c.T - 1))
+                res.append(str(s.check()))
+            self.assertEqual(res[0], res[1])
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from config import ModelConfig
+from model import make_solver
+from optimize import run_optimize
+from pyz3_utils import run_query
+
+
+class TestOptimize(unittest.TestCase):
+    def test_min_util(self):
+        c = ModelConfig.default()
+        c.cca = "const"
+        c.T = 5
+        s, v = make_solver(c)
+        s.add(v.alpha == c.C * c.R)
+        util = (v.S[-1] - v.S[0]) / (c.C * (c.T - 1))
+        res = run_optimize(c, s, v, util, timeout=60)
+        self.assertEqual(res.satisfiable, "sat")
+        assert res.value is not None and res.bound is not None
+        self.assertGreaterEqual(res.value, res.bound)
+        self.assertIsNotNone(res.model)
+
+        # Nothing beats the bound
+        s, v = make_solver(c)
+        s.add(v.alpha == c.C * c.R)
+        util = (v.S[-1] - v.S[0]) / (c.C * (c.T - 1))
+        s.add(util < res.bound)
+        self.assertEqual(str(run_query(c, s, v, 60).satisfiable), "unsat")
+
+    def test_infeasible(self):
+        c = ModelConfig.default()
+        c.cca = "const"
+        c.T = 5
+        s, v = make_solver(c)
+        s.add(v.S[-1] < v.S[0])
+        res = run_optimize(c, s, v, v.S[-1], timeout=60)
+        self.assertEqual(res.satisfiable, "unsat")
+        self.assertIsNone(res.model)
+
+    def test_unsat_core(self):
+        c = ModelConfig.default()
+        c.cca = "const"
+        c.T = 5
+        c.unsat_core = True
+        s, v = make_solver(c)
+        self.assertRaises(AssertionError, run_optimize, c, s, v, v.S[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import os
+import tempfile
+import unittest
+
+from config import ModelConfig
+from portfolio import default_portfolio, run_portfolio
+from pyz3_utils import run_query
+from test_helpers import low_util
+
+
+class TestPortfolio(unittest.TestCase):
+    def test_agrees_with_run_query(self):
+        c = ModelConfig.default()
+        c.cca = "const"
+        c.T = 5
+        configs = default_portfolio(4)
+        with tempfile.TemporaryDirectory() as d:
+            log = os.path.join(d, "portfolio.log")
+            for thresh in [0.1, 1.5]:
+                s, v = low_util(c, thresh)
+                expected = str(run_query(c, s, v, 60).satisfiable)
+                s, v = low_util(c, thresh)
+                res = run_portfolio(c, s, v, 60, configs, log=log)
+                self.assertEqual(res.satisfiable, expected)
+                self.assertIn(res.winner, configs)
+                self.assertEqual(res.finished[-1][0], res.winner)
+                self.assertEqual(res.model is not None, expected == "sat")
+            with open(log) as f:
+                self.assertEqual(len(f.readlines()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from fractions import Fraction
+from z3 import Real
+
+from config import ModelConfig
+from model import make_solver
+from presolve import to_constraints
+
+
+class TestPresolve(unittest.TestCase):
+    def test_to_constraints(self):
+        a, b = Real("a"), Real("b")
+        self.assertEqual(
+            to_constraints(2 * a - b / 4 + 1 <= 3 * b),
+            [({"a": Fraction(2), "b": Fraction(-13, 4)}, Fraction(1))])
+        self.assertEqual(len(to_constraints(a == b)), 2)
+
+    def test_bounds(self):
+        c = ModelConfig.default()
+        c.enhancement = True
+        c.presolve = True
+        s, v = make_solver(c)
+        self.assertGreater(s.presolve_report.tightened, 0)
+
+        # The bounds are implied by the model, so the extremes remain feasible
+        s.add(v.S[-1] == c.C * (c.T - 1))
+        self.assertEqual(str(s.check()), "sat")
+
+        c.presolve = False
+        s, v = make_solver(c)
+        s.add(v.S[-1] > c.C * (c.T - 1))
+        self.assertEqual(str(s.check()), "unsat")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+from config import ModelConfig
+from model import make_solver
+from template import get_template, make_solver_cached
+
+
+class TestTemplate(unittest.TestCase):
+    def test_matches_make_solver(self):
+        c = ModelConfig.default()
+        c.cca = "aimd"
+        c.buf_min = 1
+        c.buf_max = 1
+        tmpl = get_template(c)
+        self.assertIs(tmpl, get_template(c))
+
+        for thresh in [0.1, 0.9]:
+            s1, v1 = make_solver(c)
+            s2, v2 = make_solver_cached(c)
+            s1.add(v1.S[-1] - v1.S[0] < thresh * c.C * (c.T - 1))
+            s2.add(v2.S[-1] - v2.S[0] < thresh * c.C * (c.T - 1))
+            self.assertEqual(str(s1.check()), str(s2.check()))
+
+        # A different CCA reuses the same template
+        c.cca = "const"
+        self.assertIs(tmpl, get_template(c))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from config import ModelConfig
+from model import make_solver
+from pyz3_utils import MySolver
+from unroll import IncrementalModel, smallest_failing_horizon
+from variables import Variables
+
+
+class TestUnroll(unittest.TestCase):
+    def test_matches_make_solver(self):
+        def prop(c: ModelConfig, s: MySolver, v: Variables):
+            s.add(v.S[-1] - v.S[0] < 0.5 * c.C * (c.T - 1))
+            s.add(v.A[0] == v.S[0])
+
+        c = ModelConfig.default()
+        c.cca = "const"
+        c.alpha = c.C * c.R
+        c.T = 4
+        m = IncrementalModel(c)
+        for T in range(4, 8):
+            c.T = T
+            s, v = make_solver(c)
+            prop(c, s, v)
+            self.assertEqual(m.check(prop), str(s.check()))
+            m.extend()
+        self.assertEqual(m.c.T, 8)
+
+    def test_smallest_failing_horizon(self):
+        def never(c: ModelConfig, s: MySolver, v: Variables):
+            s.add(v.S[-1] < v.S[0])
+
+        def always(c: ModelConfig, s: MySolver, v: Variables):
+            s.add(v.S[-1] >= v.S[0])
+
+        c = ModelConfig.default()
+        c.cca = "const"
+        c.T = 4
+        self.assertEqual(smallest_failing_horizon(c, never, T_max=6),
+                         [(4, "unsat"), (5, "unsat"), (6, "unsat")])
+        self.assertEqual(smallest_failing_horizon(c, always, T_max=6),
+                         [(4, "sat")])
+
+
+if __name__ == '__main__':
+    unittest.main()
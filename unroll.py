@@ -0,0 +1,139 @@
+''' Incremental horizon unrolling (bounded model checking). Keeps one live
+solver and extends the horizon T -> T + k, asserting only the constraints that
+were not already asserted. Learned lemmas are kept across horizons '''
+
+from copy import copy
+from fractions import Fraction
+from typing import Callable, Dict, List, Optional, Tuple
+import z3
+
+from config import ModelConfig
+from model import make_solver
+from pyz3_utils import MySolver
+from utils import ModelDict, RecordingSolver, model_to_dict
+from variables import Variables
+
+Property = Callable[[ModelConfig, MySolver, Variables], None]
+
+
+class IncrementalModel:
+    ''' The encoding is regenerated in Python for every horizon, but only the
+    difference reaches z3. A constraint can depend on the horizon (e.g. x[t-1]
+    wraps around to the last timestep at t=0). Hence a newly generated
+    constraint is first asserted under an assumption literal and is made
+    permanent only once the next horizon generates it too. '''
+
+    def __init__(self, c: ModelConfig, s: Optional[MySolver] = None):
+        self.c = copy(c)
+        if s is None:
+            s = MySolver()
+        if c.unsat_core:
+            s.set(unsat_core=True)
+        self.s = s
+        # Constraints asserted unconditionally, keyed by z3 AST id
+        self.base: Dict[int, z3.BoolRef] = {}
+        # Constraints asserted under self.tail_lit
+        self.tail: Dict[int, z3.BoolRef] = {}
+        self.tail_lit: Optional[z3.BoolRef] = None
+        self.num_lits = 0
+        self.v = self._unroll(self.c.T)
+
+    def _fresh_lit(self, kind: str) -> z3.BoolRef:
+        self.num_lits += 1
+        return self.s.Bool(f"unroll_{kind}_{self.num_lits}")
+
+    def _record(self, c: ModelConfig) -> Tuple[Dict[int, z3.BoolRef],
+                                               Variables]:
+        r = RecordingSolver()
+        _, v = make_solver(c, r)
+        self.s.variables |= r.variables
+        return {e.get_id(): e for e in r.recorded}, v
+
+    def _unroll(self, T: int) -> Variables:
+        self.c.T = T
+        cons, v = self._record(self.c)
+        if any(k not in cons for k in self.base):
+            raise ValueError(f"The encoding at T={T} drops a constraint that "
+                             "was made permanent. Use make_solver instead")
+
+        # Promote the tail constraints that survived to the new horizon
+        for k, e in self.tail.items():
+            if k in cons and k not in self.base:
+                self.s.add(e)
+                self.base[k] = e
+        if self.tail_lit is not None:
+            # Retire the old tail
+            self.s.add(z3.Not(self.tail_lit))
+
+        self.tail_lit = self._fresh_lit("horizon")
+        self.tail = {k: e for k, e in cons.items() if k not in self.base}
+        for e in self.tail.values():
+            self.s.add(z3.Implies(self.tail_lit, e))
+        return v
+
+    def extend(self, k: int = 1) -> Variables:
+        ''' Append k timesteps to the horizon '''
+        assert (k >= 1)
+        self.v = self._unroll(self.c.T + k)
+        return self.v
+
+    def check(self, prop: Optional[Property] = None) -> str:
+        ''' Check the model at the current horizon together with `prop`, which
+        adds the property's constraints for this horizon. Returns "sat",
+        "unsat" or "unknown" '''
+        assumptions = [self.tail_lit]
+        if prop is not None:
+            r = RecordingSolver()
+            prop(self.c, r, self.v)
+            self.s.variables |= r.variables
+            lit = self._fresh_lit("prop")
+            for e in r.recorded:
+                self.s.add(z3.Implies(lit, e))
+            assumptions.append(lit)
+        res = str(self.s.s.check(*assumptions))
+        if prop is not None:
+            # The property is specific to this horizon
+            self.s.add(z3.Not(assumptions[-1]))
+        return res
+
+    def model(self) -> ModelDict:
+        return model_to_dict(self.s.s.model())
+
+
+def smallest_failing_horizon(
+        c: ModelConfig, prop: Property, T_max: int,
+        timeout: Optional[float] = None) -> List[Tuple[int, str]]:
+    ''' Starting at c.T, find the smallest horizon <= T_max at which `prop` is
+    satisfiable. Returns the (T, result) of every horizon checked, in order.
+    The search succeeded iff the last result is "sat". It stops early if a
+    check returns "unknown". `timeout` (in seconds) applies to each check '''
+    m = IncrementalModel(c)
+    if timeout is not None:
+        m.s.s.set(timeout=int(timeout * 1000))
+    res = []
+    while True:
+        res.append((m.c.T, m.check(prop)))
+        if res[-1][1] != "unsat" or m.c.T >= T_max:
+            return res
+        m.extend()
+
+
+if __name__ == "__main__":
+    c = ModelConfig.default()
+    c.cca = "aimd"
+    c.buf_min = 1
+    c.buf_max = 1
+    c.T = 4
+
+    def prop(c: ModelConfig, s: MySolver, v: Variables):
+        # Converse of the steady state lemma in aimd_proofs.py
+        max_cwnd = c.C*(c.R + c.D) + c.buf_min + v.alpha
+        max_undet = c.C*(c.R + c.D) + v.alpha
+        s.add(v.L_f[0][0] - v.Ld_f[0][0] <= max_undet)
+        s.add(v.c_f[0][0] <= max_cwnd)
+        s.add(v.alpha < Fraction(1, 3))
+        s.add(z3.Or(v.L_f[0][-1] - v.Ld_f[0][-1] > max_undet,
+                    v.c_f[0][-1] > max_cwnd))
+
+    for T, res in smallest_failing_horizon(c, prop, T_max=15):
+        print(f"T = {T}: {res}")
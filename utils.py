@@ -1,9 +1,8 @@
 from fractions import Fraction
-from typing import Callable, Dict, Union
+from typing import Dict, List, Union
 import z3
 
-from config import ModelConfig
-from pyz3_utils import BinarySearch, MySolver
+from pyz3_utils import MySolver
 
 ModelDict = Dict[str, Union[Fraction, bool]]
 
@@ -25,6 +24,29 @@ def model_to_dict(model: z3.ModelRef) -> ModelDict:
     return res
 
 
+class RecordingSolver(MySolver):
+    ''' A MySolver that records assertions instead of asserting them, so the
+    caller can decide how (and whether) to assert them '''
+
+    def __init__(self):
+        super().__init__()
+        self.recorded: List[z3.BoolRef] = []
+
+    def add(self, expr):
+        self.recorded.append(expr)
+
+    def set(self, **kwds):
+        pass
+
+
+def solver_assertions(s: MySolver) -> List[z3.BoolRef]:
+    ''' The assertions added to `s` so far. RecordingSolvers keep them to
+    themselves rather than in s.s '''
+    if isinstance(s, RecordingSolver):
+        return list(s.recorded)
+    return list(s.s.assertions())
+
+
 def make_periodic(c, s, v, dur: int):
     '''A utility function that makes the solution periodic. A periodic solution
     means the same pattern can repeat indefinitely. If we don't make it
@@ -35,7 +57,8 @@ def make_periodic(c, s, v, dur: int):
 
     `dur` is the number of timesteps for which the cwnd of our CCA is
     arbitrary. They are arbitrary to ensure the solver can pick any initial
-    conditions. For AIMD dur=1, for Copa dur=c.R+c.D, for BBR dur=2*c.R
+    conditions. For AIMD dur=1, for Copa dur=c.R+c.D, for BBR dur=2*c.R (see
+    cca_registry.freedom_duration)
 
     '''
     s.add(v.A[-1] - v.L[-1] - (c.C * (c.T - 1) - v.W[-1]) == v.A[0] - v.L[0] -
@@ -47,19 +70,3 @@ def make_periodic(c, s, v, dur: int):
         for dt in range(dur):
             s.add(v.c_f[n][c.T - 1 - dt] == v.c_f[n][dur - 1 - dt])
             s.add(v.r_f[n][c.T - 1 - dt] == v.r_f[n][dur - 1 - dt])
-
-
-def find_bound(model_cons: Callable[[ModelConfig, float], MySolver],
-               cfg: ModelConfig, search: BinarySearch, timeout: float):
-    while True:
-        thresh = search.next_pt()
-        if thresh is None:
-            break
-        s = model_cons(cfg, thresh)
-
-        print(f"Testing threshold = {thresh}")
-        qres = cache.run_query(s, cfg, timeout=timeout)
-
-        print(qres.satisfiable)
-        search.register_pt(thresh, sat_to_val(qres.satisfiable))
-    return search.get_bounds()
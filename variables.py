@@ -26,8 +26,12 @@ class Variables(pyz3_utils.Variables):
         # Cumulative number of bytes sent by flow n till time t
         self.A_f = [[s.Real(f"{pre}arrival_{n},{t}") for t in range(T)]
                     for n in range(c.N)]
-        # Sum of A_f across all flows
-        self.A = [s.Real(f"{pre}tot_arrival_{t}") for t in range(T)]
+        # Sum of A_f across all flows. With c.alias_aggregates and a single
+        # flow, A, S and L are the per-flow terms of flow 0
+        if c.aggregates_aliased():
+            self.A = list(self.A_f[0])
+        else:
+            self.A = [s.Real(f"{pre}tot_arrival_{t}") for t in range(T)]
         # Congestion window for flow n at time t
         self.c_f = [[s.Real(f"{pre}cwnd_{n},{t}") for t in range(T)]
                     for n in range(c.N)]
@@ -45,12 +49,18 @@ class Variables(pyz3_utils.Variables):
         self.S_f = [[s.Real(f"{pre}service_{n},{t}") for t in range(T)]
                     for n in range(c.N)]
         # Sum of S_f across all flows
-        self.S = [s.Real(f"{pre}tot_service_{t}") for t in range(T)]
+        if c.aggregates_aliased():
+            self.S = list(self.S_f[0])
+        else:
+            self.S = [s.Real(f"{pre}tot_service_{t}") for t in range(T)]
         # Cumulative number of bytes lost for flow n till time t
         self.L_f = [[s.Real(f"{pre}losts_{n},{t}") for t in range(T)]
                     for n in range(c.N)]
         # Sum of L_f for all flows
-        self.L = [s.Real(f"{pre}tot_lost_{t}") for t in range(T)]
+        if c.aggregates_aliased():
+            self.L = list(self.L_f[0])
+        else:
+            self.L = [s.Real(f"{pre}tot_lost_{t}") for t in range(T)]
         # Cumulative number of bytes wasted by the server till time t
         self.W = [s.Real(f"{pre}wasted_{t}") for t in range(T)]
         # Whether or not flow n is timing out at time t
@@ -66,8 +76,15 @@ class Variables(pyz3_utils.Variables):
         # This is only computed when calculate_qdel=True since not all CCAs
         # require it. Of the CCAs implemented so far, only Copa requires it
         if c.calculate_qdel:
-            self.qdel = [[s.Bool(f"{pre}qdel_{t},{dt}") for dt in range(T)]
+            Q = c.qdel_window_len()
+            self.qdel = [[s.Bool(f"{pre}qdel_{t},{dt}") for dt in range(Q)]
                          for t in range(T)]
+            # If the window is smaller than T, qdel_over[t] is true iff the
+            # queueing delay at t is >= Q. This keeps the number of Bools (and
+            # constraints) linear in T
+            if Q < T:
+                self.qdel_over = [s.Bool(f"{pre}qdel_over_{t}")
+                                  for t in range(T)]
 
         # This is for the non-composing model where waste is allowed only when
         # A - L and S come within epsilon of each other. See in 'config' for